@@ -1,5 +1,37 @@
 from . import gui
 
+from . import events
+
 from . import analysis
 
+from . import plotting
+
+from . import cache
+
+from . import store
+
+from . import ingest
+
+from . import chunked
+
+from . import output
+
+from . import profiling
+
+from . import cli
+
+from . import sweep
+
+from . import grouped
+
+from . import cohort
+
+from . import watch
+
+from . import streaming
+
+from . import synthetic
+
+from . import benchmark
+
 from . import utils
@@ -3,26 +3,444 @@ Analysis module, containing the core logic for data analysis.
 """
 
 import os
-import re
+import time
 import logging
+import tracemalloc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Side
-from sklearn.metrics import r2_score
-from sklearn.linear_model import LinearRegression
 
 from utils import get_resource_path
+from cache import ResultCache, params_key, file_hash
+from ingest import read_xy, csv_engine as fastest_csv_engine
+from chunked import read_trimmed_xy
+from output import write_results
+from store import ResultStore
+from profiling import SpecimenProfile, ProfileReport, stage
 from config import (DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, OUTPUT_IMAGE_DIR, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
-                    DEFAULT_Displacement_Constant, Excel_Type)
+                    DEFAULT_Displacement_Constant, DEFAULT_WINDOW_ENGINE, DEFAULT_WORKERS, DEFAULT_PLOT_MODE,
+                    DEFAULT_PLOT_WORKERS, DEFAULT_OUTLIER_THRESHOLD, DEFAULT_USE_CACHE, CACHE_SUFFIX,
+                    DEFAULT_USE_SIDECAR, PLOT_MODES, WINDOW_ENGINES, DEFAULT_OUTPUT_FORMATS, DEFAULT_PROFILE,
+                    DEFAULT_PROFILE_MEMORY, PROFILE_SUFFIX, DEFAULT_USE_STORE, STORE_SUFFIX, CHUNKED_READ_MIN_BYTES,
+                    DEFAULT_CHUNK_ROWS, DEFAULT_CSV_ENGINE, DEFAULT_PLOT_POINT_BUDGET)
+
+ANALYSIS_VERSION = 1
+"""The version of the analysis algorithm. Bump it whenever a change alters the results, to invalidate cached results."""
+HEADERS = ["File Name", "Max Force", "Stiffness", "Yield force", "Postyield Displacement", "Work to fracture"]
+"""The column headers of the result rows."""
+_DEGENERATE_TOLERANCE = 1e-10
+"""Relative tolerance below which a window's centered sum of squares is treated as zero."""
+_TIE_TOLERANCE = 1e-9
+"""R² margin within which prefix-sum results are refitted directly before picking the best window."""
+_R2_EPSILON = 1e-15
+"""R² difference below which two refitted windows are considered tied (a few units of rounding error)."""
+_trapezoid = getattr(np, "trapezoid", None) or np.trapz
+"""The trapezoidal rule, `np.trapz` was renamed `np.trapezoid` in NumPy 2.0."""
+
+
+def _search_window_sklearn(x_data, y_data, min_window_size, max_window_size):
+    """
+    Searches for the best linear window by fitting a LinearRegression model to every window.
+
+    This is the original implementation, kept to cross-check the vectorized engine.
+
+    Returns:
+        tuple: (a, b, best_start, best_end) of the window with the highest R².
+    """
+    from sklearn.metrics import r2_score
+    from sklearn.linear_model import LinearRegression
+
+    best_r2 = -1
+    best_model = None
+    best_start = None
+    best_end = None
+
+    for current_window_size in range(min_window_size, max_window_size + 1):
+        for i in range(0, len(x_data) - current_window_size + 1):
+            x_window = x_data[i:i + current_window_size].reshape(-1, 1)
+            y_window = y_data[i:i + current_window_size]
+
+            model = LinearRegression()
+            model.fit(x_window, y_window)
+            y_pred = model.predict(x_window)
+
+            r2 = r2_score(y_window, y_pred)
+
+            if r2 > best_r2:
+                best_r2 = r2
+                best_model = model
+                best_start = i
+                best_end = i + current_window_size
+
+    return best_model.coef_[0], best_model.intercept_, best_start, best_end
+
+
+def _window_r2(prefix, window_size):
+    """
+    Computes the R² of the least-squares line for every window of a given size.
+
+    Args:
+        prefix (tuple): Prefix sums (x, y, xx, yy, xy) of the centered data, each with a leading zero.
+        window_size (int): The window size.
+
+    Returns:
+        numpy.ndarray: The R² of the window starting at each offset.
+    """
+    cx, cy, cxx, cyy, cxy = (p[window_size:] - p[:-window_size] for p in prefix)
+    return r2_from_sums(cx, cy, cxx, cyy, cxy, window_size)
+
+
+def r2_from_sums(cx, cy, cxx, cyy, cxy, window_size):
+    """
+    Computes the R² of the least-squares line of windows from their sums of x, y, x², y² and xy.
+
+    Args:
+        window_size (int or numpy.ndarray): The number of points in each window.
+
+    Returns:
+        numpy.ndarray: The R² of each window.
+    """
+    sxx = cxx - cx * cx / window_size
+    syy = cyy - cy * cy / window_size
+    sxy = cxy - cx * cy / window_size
+
+    flat_x = sxx <= _DEGENERATE_TOLERANCE * cxx
+    flat_y = syy <= _DEGENERATE_TOLERANCE * cyy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = sxy * sxy / (sxx * syy)
+    # Same conventions as r2_score: a constant window is a perfect fit, a vertical one explains nothing.
+    r2 = np.where(flat_x, 0.0, r2)
+    r2 = np.where(flat_y, 1.0, r2)
+    return np.clip(r2, 0.0, 1.0)
+
+
+def fit_line(x_window, y_window):
+    """
+    Fits y = a * x + b to a single window by ordinary least squares.
+
+    The R² is computed from the residuals, as `r2_score` does, so exact fits score exactly 1.
+
+    Returns:
+        tuple: (a, b, r2) for the window.
+    """
+    x_mean = x_window.mean()
+    y_mean = y_window.mean()
+    dx = x_window - x_mean
+    dy = y_window - y_mean
+    sxx = np.dot(dx, dx)
+    a = np.dot(dx, dy) / sxx if sxx > 0 else 0.0
+    b = y_mean - a * x_mean
+    residuals = y_window - (a * x_window + b)
+    ss_res = np.dot(residuals, residuals)
+    ss_tot = np.dot(dy, dy)
+    if ss_tot == 0:
+        r2 = 1.0 if ss_res == 0 else 0.0
+    else:
+        r2 = 1.0 - ss_res / ss_tot
+    return a, b, r2
+
+
+def _row_dots(u, v):
+    """Returns the dot product of each pair of rows, with the same rounding as `np.dot` on each pair."""
+    return (u[:, None, :] @ v[:, :, None])[:, 0, 0]
+
+
+def fit_windows(x_windows, y_windows):
+    """
+    Fits y = a * x + b to each row of a stack of windows of the same size. This is `fit_line` on every row at
+    once, with identical results.
+
+    Args:
+        x_windows (numpy.ndarray): The X data of the windows, one window per row.
+        y_windows (numpy.ndarray): The Y data of the windows, one window per row.
+
+    Returns:
+        tuple: The arrays (a, b, r2) of the windows.
+    """
+    x_mean = x_windows.mean(axis=1)
+    y_mean = y_windows.mean(axis=1)
+    dx = x_windows - x_mean[:, None]
+    dy = y_windows - y_mean[:, None]
+    sxx = _row_dots(dx, dx)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(sxx > 0, _row_dots(dx, dy) / sxx, 0.0)
+    b = y_mean - a * x_mean
+    residuals = y_windows - (a[:, None] * x_windows + b[:, None])
+    ss_res = _row_dots(residuals, residuals)
+    ss_tot = _row_dots(dy, dy)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot == 0, np.where(ss_res == 0, 1.0, 0.0), 1.0 - ss_res / ss_tot)
+    return a, b, r2
+
+
+def _first_best(r2):
+    """
+    Returns the index of the best R² when scanning them in order, a later R² only replacing the current best if it
+    is higher by more than `_R2_EPSILON`.
+    """
+    best = 0
+    while True:
+        higher = np.flatnonzero(r2[best + 1:] > r2[best] + _R2_EPSILON)
+        if not len(higher):
+            return best
+        best += 1 + int(higher[0])
+
+
+def _search_window_vectorized(x_data, y_data, min_window_size, max_window_size):
+    """
+    Searches for the best linear window using closed-form regression statistics.
+
+    Every window's R² is derived from prefix sums, so each window size costs a few array operations.
+    Windows within `_TIE_TOLERANCE` of the best R² are then refitted directly, all the windows of a size at once,
+    and the first maximum in (window size, start offset) order wins, as in the sklearn engine. R² values that only
+    differ by rounding error (`_R2_EPSILON`) count as ties. On exactly linear or quantized data, where almost every
+    window ties, this keeps the refit to a few array operations per window size.
+
+    Returns:
+        tuple: (a, b, best_start, best_end) of the window with the highest R².
+    """
+    x_data = np.asarray(x_data, dtype=float)
+    y_data = np.asarray(y_data, dtype=float)
+    if not (np.isfinite(x_data).all() and np.isfinite(y_data).all()):
+        raise ValueError("Input data contains NaN or infinity.")
+
+    # Centering keeps the prefix sums small and limits cancellation in the differences.
+    xc = x_data - x_data.mean() if len(x_data) else x_data
+    yc = y_data - y_data.mean() if len(y_data) else y_data
+    prefix = tuple(np.concatenate(([0.0], np.cumsum(v))) for v in (xc, yc, xc * xc, yc * yc, xc * yc))
+
+    best_r2 = -1
+    candidates = []  # The (window size, start offsets, R²) of the windows within `_TIE_TOLERANCE` of the best
+
+    for current_window_size in range(min_window_size, max_window_size + 1):
+        if current_window_size < 1 or len(x_data) - current_window_size + 1 <= 0:
+            continue
+        r2 = _window_r2(prefix, current_window_size)
+        window_best = r2.max()
+        if window_best < best_r2 - _TIE_TOLERANCE:
+            continue
+        if window_best > best_r2:
+            best_r2 = window_best
+            kept = [(size, starts[values >= best_r2 - _TIE_TOLERANCE], values[values >= best_r2 - _TIE_TOLERANCE])
+                    for size, starts, values in candidates]
+            candidates = [c for c in kept if len(c[1])]
+        starts = np.flatnonzero(r2 >= best_r2 - _TIE_TOLERANCE)
+        candidates.append((current_window_size, starts, r2[starts]))
+
+    if not candidates:
+        raise ValueError(f"Not enough data points for a window of size {min_window_size}.")
+
+    fits = []
+    for window_size, starts, _ in candidates:
+        x_windows = np.lib.stride_tricks.sliding_window_view(x_data, window_size)[starts]
+        y_windows = np.lib.stride_tricks.sliding_window_view(y_data, window_size)[starts]
+        fits.append((*fit_windows(x_windows, y_windows), starts, np.full(len(starts), window_size)))
+    a, b, r2, starts, window_sizes = (np.concatenate(values) for values in zip(*fits))
+
+    best = _first_best(r2)
+    return a[best], b[best], int(starts[best]), int(starts[best] + window_sizes[best])
+
+
+def find_best_window(x_data, y_data, min_window_size, max_window_size, engine=DEFAULT_WINDOW_ENGINE):
+    """
+    Finds the window with the best linear fit, used to determine the stiffness.
+
+    Args:
+        x_data (numpy.ndarray): The X-axis data.
+        y_data (numpy.ndarray): The Y-axis data.
+        min_window_size (int): The minimum size of the linear regression window.
+        max_window_size (int): The maximum size of the linear regression window.
+        engine (str, optional): The search engine, one of `WINDOW_ENGINES`. Defaults to `DEFAULT_WINDOW_ENGINE`.
+
+    Returns:
+        tuple: (a, b, best_start, best_end), the slope and intercept of the fit line and the window bounds.
+    """
+    if engine == "vectorized":
+        return _search_window_vectorized(x_data, y_data, min_window_size, max_window_size)
+    if engine == "sklearn":
+        return _search_window_sklearn(x_data, y_data, min_window_size, max_window_size)
+    raise ValueError(f"Unknown window engine '{engine}', expected one of {WINDOW_ENGINES}.")
+
+
+def trim_curve(x_raw, y_raw, preload=DEFAULT_PRELOAD):
+    """
+    Trims a curve to its loading region.
+
+    The region starts at the first force reaching `preload` after the highest non-positive force before the peak,
+    and ends just before the force first stops decreasing after the peak (the fracture). If the force never stops
+    decreasing, it ends at the last force reaching `preload`. NaN forces are skipped as pandas would.
+
+    Args:
+        x_raw (numpy.ndarray): The X-axis data of the whole file.
+        y_raw (numpy.ndarray): The Y-axis data of the whole file.
+        preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+
+    Returns:
+        tuple: The trimmed X and Y data.
+    """
+    x_raw = np.asarray(x_raw, dtype=float)
+    force = np.asarray(y_raw, dtype=float)
+    max_index = int(np.nanargmax(force))
+
+    # The first occurrence of the highest force <= 0 before the peak, 0 if there is none.
+    pre_candidates = np.flatnonzero(force[:max_index] <= 0)
+    pre_index = int(pre_candidates[np.argmax(force[pre_candidates])]) if len(pre_candidates) else 0
+
+    reached = np.flatnonzero(force[pre_index:] >= preload)
+    if not len(reached):
+        return x_raw[:0].copy(), force[:0].copy()
+    first_index = pre_index + int(reached[0])
+
+    # The sample before the first non-decreasing step after the peak, the last sample being excluded.
+    rising = force[max_index + 1:len(force) - 1] >= force[max_index:len(force) - 2]
+    if rising.any():
+        last_index = max_index + int(np.argmax(rising))
+    else:
+        last_index = int(np.flatnonzero(force >= preload)[-1])
+
+    return x_raw[first_index:last_index + 1].copy(), force[first_index:last_index + 1].copy()
+
+
+def find_yield_point(x_data, y_data, a, b, best_end, max_value, max_disp, YFC, dispc):
+    """
+    Finds the yield point: the first point after the fit window that lies between 80% and 100% of the fit line
+    shifted by `max_disp * dispc` and scaled by `YFC`.
+
+    If the fit window ends at the maximum force, or no point qualifies, the last point of the window is used.
+
+    Returns:
+        tuple: The X and Y of the yield point, or (None, None) if the fit window ends at the last point.
+    """
+    if y_data[best_end - 1] == max_value:
+        return x_data[best_end - 1], y_data[best_end - 1]
+    if best_end >= len(x_data):
+        return None, None
+
+    shifted_expected_y = YFC * a * (x_data[best_end:] - max_disp*dispc) + b
+    y_after = y_data[best_end:]
+    matches = (0.8 * shifted_expected_y <= y_after) & (y_after <= shifted_expected_y)
+    if matches.any():
+        i = best_end + int(np.argmax(matches))
+        return x_data[i], y_data[i]
+    return x_data[best_end - 1], y_data[best_end - 1]
+
+
+def find_fracture_index(y_data):
+    """
+    Finds the index of the lowest force of at least 0.5 N after the maximum force.
+
+    Returns:
+        int: The index, or the last index if no force after the maximum reaches 0.5 N.
+    """
+    max_index = int(np.argmax(y_data))
+
+    after_max = y_data[max_index + 1:]
+    valid = (after_max >= 0.5) & (after_max < np.inf)
+    if not valid.any():
+        return len(y_data) - 1
+    # argmin returns the first of equal minima.
+    return max_index + 1 + int(np.argmin(np.where(valid, after_max, np.inf)))
+
+
+def work_to_fracture(x_data, y_data, fracture_index):
+    """Integrates the force over the displacement, with the trapezoidal rule, up to (excluding) `fracture_index`."""
+    return _trapezoid(y_data[:fracture_index], x_data[:fracture_index])
+
+
+def warm_up(plot_mode=DEFAULT_PLOT_MODE, csv_engine=DEFAULT_CSV_ENGINE):
+    """
+    Imports the heavy dependencies that are otherwise loaded on first use: pandas, pyarrow when it parses the CSV
+    files (`csv_engine`, None for the fastest available), openpyxl and, unless no plots are rendered, matplotlib. The
+    GUI calls this from a background thread once its window is shown, and `run_batch` before the first file of each
+    worker, so the import time is never counted in the stages of a file (see `profiling`).
+    """
+    import pandas
+    import openpyxl
+    if (csv_engine or fastest_csv_engine()) == "pyarrow":
+        import pyarrow.csv
+    if plot_mode != "none":
+        import plotting
+
+
+def analyse_curve(x_raw, y_raw, min_window_size=10, max_window_size=20, preload=DEFAULT_PRELOAD, YFC=None, dispc=None,
+                  engine=DEFAULT_WINDOW_ENGINE, profile=None):
+    """
+    Analyzes a force-displacement curve that is already in memory. This is `analyse_data` without the CSV read,
+    and raises on errors instead of returning None.
+
+    Args:
+        x_raw (numpy.ndarray): The X-axis data of the whole curve.
+        y_raw (numpy.ndarray): The Y-axis data of the whole curve.
+
+    Returns:
+        dict: The analysis results and the data for plotting, as returned by `analyse_data`.
+    """
+    with stage(profile, "trim"):
+        x_data, y_data = trim_curve(x_raw, y_raw, preload)
+    return analyse_trimmed(x_data, y_data, min_window_size, max_window_size, YFC, dispc, engine, profile)
+
+
+def analyse_trimmed(x_data, y_data, min_window_size=10, max_window_size=20, YFC=None, dispc=None, engine=DEFAULT_WINDOW_ENGINE,
+                    profile=None):
+    """
+    Analyzes a curve already trimmed to its loading region, as returned by `trim_curve`. This is `analyse_curve`
+    without the trimming.
+
+    Returns:
+        dict: The analysis results and the data for plotting, as returned by `analyse_data`.
+    """
+    results = {}
+    results_plot = {}
+
+    results_plot["x_data"] = x_data
+    results_plot["y_data"] = y_data
+
+    max_disp = x_data.max()
+
+    max_value = y_data.max()
+    results["Max Force"] = max_value
+
+    with stage(profile, "window"):
+        a, b, best_start, best_end = find_best_window(x_data, y_data, min_window_size, max_window_size, engine=engine)
+
+    results_plot["a"] = a
+    results_plot["b"] = b
+
+    results["Stiffness"] = a
+
+    results_plot["best_start"] = best_start
+    results_plot["best_end"] = best_end
+
+    with stage(profile, "yield"):
+        next_x, next_y = find_yield_point(x_data, y_data, a, b, best_end, max_value, max_disp, YFC, dispc)
+    with stage(profile, "fracture"):
+        min_after_max_index = find_fracture_index(y_data)
+
+    results["Yield force"] = next_y
+    results_plot["yield_force_x"] = next_x
+    results_plot["yield_force_y"] = next_y
+    postyield_displacement = x_data[min_after_max_index] - next_x
+    results["Postyield Displacement"] = postyield_displacement
+
+    with stage(profile, "work"):
+        auc = work_to_fracture(x_data, y_data, min_after_max_index)
+    results["Work to fracture"] = auc
+
+    output_result = [results["Max Force"], results["Stiffness"], results.get("Yield force", "N/A"),
+                     results.get("Postyield Displacement", "N/A"), results["Work to fracture"]]
+
+    return {"results": output_result, "results_plot": results_plot}
 
 
 def analyse_data(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, min_window_size=10, max_window_size=20, preload=DEFAULT_PRELOAD,
-                 YFC=None, dispc = None):
+                 YFC=None, dispc = None, engine=DEFAULT_WINDOW_ENGINE, sidecar=DEFAULT_USE_SIDECAR, profile=None, chunked=None,
+                 csv_engine=DEFAULT_CSV_ENGINE, chunk_rows=DEFAULT_CHUNK_ROWS, chunked_min_bytes=CHUNKED_READ_MIN_BYTES):
     """
     Performs linear regression analysis.
 
+    CSV files of at least `chunked_min_bytes` are read a chunk at a time, keeping only their loading region in
+    memory (see `chunked`), unless they are read through a sidecar file. The results are the same either way.
+
     Args:
         csv_file (str): The path to the CSV file.
         x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
@@ -30,179 +448,288 @@ def analyse_data(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN,
         min_window_size (int, optional): The minimum size of the linear regression window. Defaults to 10.
         max_window_size (int, optional): The maximum size of the linear regression window. Defaults to 20.
         preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+        engine (str, optional): The stiffness window search engine. Defaults to `DEFAULT_WINDOW_ENGINE`.
+        sidecar (bool, optional): Whether to read the data through a binary sidecar file. Defaults to `DEFAULT_USE_SIDECAR`.
+        profile (SpecimenProfile, optional): Records the time and memory of each stage. Defaults to None.
+        chunked (bool, optional): Whether to read the file in chunks; None decides from its size. Defaults to None.
+        csv_engine (str, optional): The pandas CSV parser engine; None picks the fastest available. Defaults to `DEFAULT_CSV_ENGINE`.
+        chunk_rows (int, optional): The number of rows parsed at a time when reading in chunks. Defaults to `DEFAULT_CHUNK_ROWS`.
+        chunked_min_bytes (int, optional): The file size from which the file is read in chunks. Defaults to `CHUNKED_READ_MIN_BYTES`.
 
      Returns:
         dict or None: A dictionary containing the analysis results and data for plotting, or None if an error occurs.
     """
-    results = {}
-    results_plot = {}
-
     try:
-        df = pd.read_csv(csv_file)
-        if x_column not in df.columns or y_column not in df.columns:
-            raise ValueError(f"Column '{x_column}' or '{y_column}' not found in the CSV file.")
-
-        force_col = df[y_column]
-        max_index = force_col.idxmax()
-        pre_index_series = force_col[:max_index][force_col[:max_index] <= 0]
-        if pre_index_series.empty:
-            pre_index = 0
-        else:
-            pre_index = pre_index_series.idxmax()
-        first_index = force_col[force_col.index >= pre_index][force_col[force_col.index >= pre_index] >= preload].index.min()
-        last_index = None
-        for i in range(max_index + 1, len(force_col) - 1):
-            if force_col[i] >= force_col[i - 1]:
-                last_index = i-1
-                break
-        if last_index is None:
-            last_index = df[df[y_column] >= preload].index.max()
-        if first_index is not None:
-            df = df.loc[first_index:last_index]
-        else:
-            df = pd.DataFrame(columns=df.columns)
+        if chunked is None:
+            chunked = not sidecar and os.path.getsize(csv_file) >= chunked_min_bytes
+        if chunked:
+            # The trimming is done while reading, so the "read" stage also covers it.
+            with stage(profile, "read"):
+                x_data, y_data = read_trimmed_xy(csv_file, x_column, y_column, preload, chunk_rows, csv_engine)
+            return analyse_trimmed(x_data, y_data, min_window_size, max_window_size, YFC, dispc, engine, profile)
+        with stage(profile, "read"):
+            x_raw, y_raw = read_xy(csv_file, x_column, y_column, sidecar=sidecar, engine=csv_engine)
+        return analyse_curve(x_raw, y_raw, min_window_size, max_window_size, preload, YFC, dispc, engine, profile)
 
-        x_data = df[x_column].values
-        y_data = df[y_column].values
-
-        results_plot["x_data"] = x_data
-        results_plot["y_data"] = y_data
+    except Exception as e:
+        logging.error(f"Error in analyse_data: {e}")
+        return None
 
-        max_disp = df[x_column].max()
 
-        max_value = df[y_column].max()
-        results["Max Force"] = max_value
+def read_curve(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, csv_engine=DEFAULT_CSV_ENGINE):
+    """
+    Reads the raw X and Y data of a CSV file, e.g. to plot a file whose analysis failed.
 
-        best_r2 = -1
-        best_model = None
-        best_start = None
-        best_end = None
+    Returns:
+        dict: The "x_data" and "y_data" arrays.
+    """
+    x_data, y_data = read_xy(csv_file, x_column, y_column, engine=csv_engine)
+    return {"x_data": x_data, "y_data": y_data}
 
-        for current_window_size in range(min_window_size, max_window_size + 1):
-            for i in range(0, len(x_data) - current_window_size + 1):
-                x_window = x_data[i:i + current_window_size].reshape(-1, 1)
-                y_window = y_data[i:i + current_window_size]
 
-                model = LinearRegression()
-                model.fit(x_window, y_window)
-                y_pred = model.predict(x_window)
+def find_outliers(rows, threshold=DEFAULT_OUTLIER_THRESHOLD):
+    """
+    Finds the result rows with at least one outlying value.
 
-                r2 = r2_score(y_window, y_pred)
+    A value is an outlier when its modified z-score (based on the median absolute deviation of its column)
+    exceeds `threshold`, or when it is missing or not a number.
 
-                if r2 > best_r2:
-                    best_r2 = r2
-                    best_model = model
-                    best_start = i
-                    best_end = i + current_window_size
+    Args:
+        rows (list): The Excel result rows, i.e. the file name followed by the numeric results.
+        threshold (float, optional): The modified z-score limit. Defaults to `DEFAULT_OUTLIER_THRESHOLD`.
 
-        a = best_model.coef_[0]
-        b = best_model.intercept_
+    Returns:
+        set: The indices of the outlier rows.
+    """
+    if not rows:
+        return set()
+    values = np.array([[v if isinstance(v, (int, float, np.number)) else np.nan for v in row[1:]] for row in rows], dtype=float)
+    outliers = ~np.isfinite(values)
+    for col in range(values.shape[1]):
+        column = values[:, col]
+        finite = np.isfinite(column)
+        if not finite.any():
+            continue
+        median = np.median(column[finite])
+        mad = np.median(np.abs(column[finite] - median))
+        if mad == 0:
+            continue
+        with np.errstate(invalid='ignore'):
+            outliers[:, col] |= 0.6745 * np.abs(column - median) / mad > threshold
+    return set(np.flatnonzero(outliers.any(axis=1)).tolist())
+
+
+def find_data_files(file_path):
+    """
+    Finds all the data files in a folder.
 
-        results_plot["a"] = a
-        results_plot["b"] = b
+    Args:
+        file_path (str): The path to the root folder.
 
-        results["Stiffness"] = a
+    Returns:
+        list: The paths of all files ending in "Data.csv", in `os.walk` order.
+    """
+    files = []
+    for root, _, filenames in os.walk(file_path):
+        for filename in filenames:
+            if filename.endswith("Data.csv"):
+                files.append(os.path.join(root, filename))
+    return files
 
-        results_plot["best_start"] = best_start
-        results_plot["best_end"] = best_end
 
-        next_x = None
-        next_y = None
+def process_file(csv_file, min_window_size, max_window_size, preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant,
+                 disp_c=DEFAULT_Displacement_Constant, engine=DEFAULT_WINDOW_ENGINE, sidecar=DEFAULT_USE_SIDECAR, x_column=DEFAULT_X_COLUMN,
+                 y_column=DEFAULT_Y_COLUMN, profile=False, profile_memory=DEFAULT_PROFILE_MEMORY, hash_file=False,
+                 csv_engine=DEFAULT_CSV_ENGINE, chunk_rows=DEFAULT_CHUNK_ROWS, chunked_min_bytes=CHUNKED_READ_MIN_BYTES):
+    """
+    Analyzes a single CSV file. This is the unit of work of `save_files`.
 
-        if y_data[best_end - 1] == max_value:
-            next_x = x_data[best_end - 1]
-            next_y = y_data[best_end - 1]
+    Args:
+        csv_file (str): The path to the CSV file.
+        min_window_size (int): The minimum size of the linear regression window.
+        max_window_size (int): The maximum size of the linear regression window.
+        preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+        engine (str, optional): The stiffness window search engine. Defaults to `DEFAULT_WINDOW_ENGINE`.
+        profile (bool, optional): Whether to record the stages in a `SpecimenProfile`. Defaults to False.
+        profile_memory (bool, optional): Whether the profile measures peak memory. Defaults to `DEFAULT_PROFILE_MEMORY`.
+        hash_file (bool, optional): Whether to compute the SHA-256 hash of the file's content. Defaults to False.
+        csv_engine (str, optional): The pandas CSV parser engine, see `analyse_data`.
+        chunk_rows (int, optional): The number of rows parsed at a time in chunked reads, see `analyse_data`.
+        chunked_min_bytes (int, optional): The size from which the file is read in chunks, see `analyse_data`.
+
+    Returns:
+        dict: The Excel result row (None on failure), the plot data, the error message (None on success), the
+        profile records (None when not profiling), the best stiffness window (start, end), the analysis time in
+        seconds and the file hash (None unless `hash_file`).
+    """
+    file_name = os.path.basename(os.path.dirname(csv_file))
+    outcome = {"file": csv_file, "name": file_name, "row": None, "results_plot": None, "error": None, "profile": None,
+               "window": None, "seconds": None, "hash": None}
+    specimen_profile = SpecimenProfile(file_name, trace_memory=profile_memory) if profile else None
+    if specimen_profile:
+        outcome["profile"] = specimen_profile.records
+    try:
+        if hash_file:
+            outcome["hash"] = file_hash(csv_file)
+        start = time.perf_counter()
+        analysis_output = analyse_data(csv_file, x_column=x_column, y_column=y_column, min_window_size=min_window_size,
+                                       max_window_size=max_window_size, preload=preload, YFC=YFC, dispc=disp_c, engine=engine,
+                                       sidecar=sidecar, profile=specimen_profile, csv_engine=csv_engine, chunk_rows=chunk_rows,
+                                       chunked_min_bytes=chunked_min_bytes)
+        outcome["seconds"] = time.perf_counter() - start
+        result = analysis_output["results"]
+        my_plot = analysis_output["results_plot"]
+
+        outcome["results_plot"] = my_plot
+        outcome["window"] = (int(my_plot["best_start"]), int(my_plot["best_end"]))
+        if result:
+            outcome["row"] = [file_name] + result
         else:
-            if best_end < len(x_data):
-                for i in range(best_end, len(x_data)):
-                    shifted_expected_y = YFC * a * (x_data[i] - max_disp*dispc) + b
-                    if 0.8 * shifted_expected_y <= y_data[i] <= shifted_expected_y:
-                        next_x = x_data[i]
-                        next_y = y_data[i]
-                        break
-                    if i == len(x_data) - 1 and next_x is None:
-                        next_x = x_data[best_end - 1]
-                        next_y = y_data[best_end - 1]
-        max_index = int(np.argmax(y_data))
-
-        min_after_max_index = len(y_data) - 1
-        min_after_max_value = float('inf')
-
-        for i in range(max_index + 1, len(y_data)):
-            if 0.5 <= y_data[i] < min_after_max_value:
-                min_after_max_value = y_data[i]
-                min_after_max_index = i
-
-        results["Yield force"] = next_y
-        results_plot["yield_force_x"] = next_x
-        results_plot["yield_force_y"] = next_y
-        postyield_displacement = x_data[min_after_max_index] - next_x
-        results["Postyield Displacement"] = postyield_displacement
-
-        auc = np.trapz(y_data[:min_after_max_index], x_data[:min_after_max_index])
-        results["Work to fracture"] = auc
-
-        output_result = [results["Max Force"], results["Stiffness"], results.get("Yield force", "N/A"),
-                         results.get("Postyield Displacement", "N/A"), results["Work to fracture"]]
-
-        return {"results": output_result, "results_plot": results_plot}
-
+            outcome["error"] = "No results"
     except Exception as e:
-        logging.error(f"Error in create_scatter_plot: {e}")
-        return None
+        logging.error(f"Error processing file {csv_file}: {e}")
+        outcome["error"] = str(e)
+    return outcome
 
 
-def create_scatter_plot(title="3point", xlabel=DEFAULT_X_COLUMN, ylabel=DEFAULT_Y_COLUMN, output_image="scatter_plot.png", results_plot=None):
+def run_batch(files, min_window_size, max_window_size, preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant,
+              disp_c=DEFAULT_Displacement_Constant, engine=DEFAULT_WINDOW_ENGINE, sidecar=DEFAULT_USE_SIDECAR, x_column=DEFAULT_X_COLUMN,
+              y_column=DEFAULT_Y_COLUMN, workers=DEFAULT_WORKERS, progress_callback=None, outcome_callback=None, profile=False,
+              profile_memory=DEFAULT_PROFILE_MEMORY, hash_file=False, cancel_event=None, csv_engine=DEFAULT_CSV_ENGINE,
+              chunk_rows=DEFAULT_CHUNK_ROWS, chunked_min_bytes=CHUNKED_READ_MIN_BYTES):
     """
-        Creates a scatter plot.
+    Processes a list of CSV files, serially or in a pool of worker processes.
+
+    The outcomes are always returned in the order of `files`, whatever order the workers finish in.
+    `outcome_callback` and `progress_callback` are called from the calling process after each file completes.
 
-        Args:
-            title (str, optional): The title of the plot. Defaults to "3point".
-            xlabel (str, optional): The label for the X-axis. Defaults to `DEFAULT_X_COLUMN`.
-            ylabel (str, optional): The label for the Y-axis. Defaults to `DEFAULT_Y_COLUMN`.
-            output_image (str, optional): The filename for the output image. Defaults to "scatter_plot.png".
+    Once `cancel_event` is set, no new file is started: the files being analyzed are finished, and the outcomes of
+    the files that were never started are None.
 
+    Args:
+        files (list): The paths of the CSV files.
+        workers (int, optional): The number of worker processes; 1 processes the files in this process. Defaults to `DEFAULT_WORKERS`.
+        progress_callback (function, optional): Called with (completed files, total files).
+        outcome_callback (function, optional): Called with (file index, outcome) as soon as a file is analyzed.
+        profile (bool, optional): Whether to profile the stages of each file, see `process_file`. Defaults to False.
+        hash_file (bool, optional): Whether to hash the content of each file, see `process_file`. Defaults to False.
+        cancel_event (threading.Event, optional): Stops the batch between two files when set.
+        csv_engine (str, optional): The pandas CSV parser engine, see `analyse_data`.
+        chunk_rows (int, optional): The number of rows parsed at a time in chunked reads, see `analyse_data`.
+        chunked_min_bytes (int, optional): The size from which files are read in chunks, see `analyse_data`.
+
+    Returns:
+        list: The `process_file` outcome of each file, or None for the files skipped after a cancellation.
     """
-    try:
-        x_data = results_plot["x_data"]
-        y_data = results_plot["y_data"]
+    total_files = len(files)
+    kwargs = dict(min_window_size=min_window_size, max_window_size=max_window_size, preload=preload, YFC=YFC, disp_c=disp_c,
+                  engine=engine, sidecar=sidecar, x_column=x_column, y_column=y_column, profile=profile,
+                  profile_memory=profile_memory, hash_file=hash_file, csv_engine=csv_engine, chunk_rows=chunk_rows,
+                  chunked_min_bytes=chunked_min_bytes)
+
+    if workers is None or workers <= 1 or total_files <= 1:
+        warm_up("none", csv_engine)
+        outcomes = [None] * total_files
+        for index, f in enumerate(files):
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            outcomes[index] = process_file(f, **kwargs)
+            if outcome_callback:
+                outcome_callback(index, outcomes[index])
+            if progress_callback:
+                progress_callback(index + 1, total_files)
+        return outcomes
+
+    outcomes = [None] * total_files
+    # Spawned workers do not inherit the GUI's Tk thread state, and behave the same on every platform.
+    with ProcessPoolExecutor(max_workers=min(workers, total_files), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=warm_up, initargs=("none", csv_engine)) as executor:
+        futures = {executor.submit(process_file, f, **kwargs): index for index, f in enumerate(files)}
+        completed = 0
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            completed += 1
+            index = futures[future]
+            try:
+                outcomes[index] = future.result()
+            except Exception as e:
+                logging.error(f"Error processing file {files[index]}: {e}")
+                outcomes[index] = {"file": files[index], "name": os.path.basename(os.path.dirname(files[index])), "row": None,
+                                   "results_plot": None, "error": str(e), "profile": None,
+                                   "window": None, "seconds": None, "hash": None}
+            if outcome_callback:
+                outcome_callback(index, outcomes[index])
+            if progress_callback:
+                progress_callback(completed, total_files)
+            if cancel_event is not None and cancel_event.is_set():
+                # Only the files that have not started yet can be cancelled, the running ones are still collected.
+                for pending_future in futures:
+                    pending_future.cancel()
+    return outcomes
+
+
+def plot_outcome(outcome, png_dir, analysis_kwargs, report=None, point_budget=DEFAULT_PLOT_POINT_BUDGET, read_kwargs=None):
+    """
+    Renders the plot of an analyzed file, or the raw data of a failed one.
 
-        plt.figure(figsize=(8, 6))
-        plt.scatter(x_data, y_data, label="other")
-        plt.title(title)
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        plt.grid(True)
+    Results loaded from the cache carry no plot data, so their file is analyzed again with `analysis_kwargs`, and
+    read with the `analyse_data` reading options of `read_kwargs` (csv_engine, chunk_rows, chunked_min_bytes).
+    With a `ProfileReport`, the time spent drawing and saving the plot is recorded as the "plot" stage. Curves
+    longer than `point_budget` are decimated, see `plotting.decimate`.
+    """
+    from plotting import create_scatter_plot
+
+    read_kwargs = read_kwargs or {}
+    x_column = analysis_kwargs["x_column"]
+    y_column = analysis_kwargs["y_column"]
+    output_image = get_resource_path(os.path.join(png_dir, outcome["name"] + '.png'))
+    results_plot = outcome["results_plot"]
+    if results_plot is None and outcome["row"]:
+        results_plot = analyse_data(outcome["file"], **analysis_kwargs, **read_kwargs)["results_plot"]
+    # The plots are rendered on several threads at once, so their memory cannot be told apart.
+    specimen_profile = SpecimenProfile(outcome["name"], trace_memory=False) if report else None
+    with stage(specimen_profile, "plot"):
+        if results_plot is not None:
+            create_scatter_plot(title=outcome["name"], xlabel=x_column, ylabel=y_column, output_image=output_image, results_plot=results_plot,
+                                point_budget=point_budget)
+        else:
+            create_scatter_plot(title=outcome["name"] + " (failed)", xlabel=x_column, ylabel=y_column, output_image=output_image,
+                                results_plot=read_curve(outcome["file"], x_column, y_column, read_kwargs.get("csv_engine")),
+                                point_budget=point_budget)
+    if report:
+        report.add(specimen_profile.records)
 
-        best_start = results_plot["best_start"]
-        best_end = results_plot["best_end"]
 
-        a = results_plot['a']
-        b = results_plot['b']
+def save_files(file_path, progress_callback, on_complete, min_window_size, max_window_size, failed_files_callback, preload=DEFAULT_PRELOAD,
+               YFC=DEFAULT_Yield_Force_Constant, disp_c=DEFAULT_Displacement_Constant, engine=DEFAULT_WINDOW_ENGINE, workers=DEFAULT_WORKERS,
+               plot_mode=DEFAULT_PLOT_MODE, plot_workers=DEFAULT_PLOT_WORKERS, use_cache=DEFAULT_USE_CACHE, sidecar=DEFAULT_USE_SIDECAR,
+               x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, result_callback=None, output_formats=DEFAULT_OUTPUT_FORMATS,
+               profile=DEFAULT_PROFILE, profile_memory=DEFAULT_PROFILE_MEMORY, use_store=DEFAULT_USE_STORE, cancel_event=None,
+               outlier_threshold=DEFAULT_OUTLIER_THRESHOLD, point_budget=DEFAULT_PLOT_POINT_BUDGET, csv_engine=DEFAULT_CSV_ENGINE,
+               chunk_rows=DEFAULT_CHUNK_ROWS, chunked_min_bytes=CHUNKED_READ_MIN_BYTES):
+    """
+    Analyzes all CSV files in a specified folder and writes the results to an Excel file.
 
-        x_fit_window = x_data[best_start:best_end]
-        y_fit_window = y_data[best_start:best_end]
+    The Excel file is named after the folder; `output_formats` can add, or replace it by, CSV and Parquet files.
 
-        plt.scatter(x_fit_window, y_fit_window, color='yellow', label="linear")
-        x_fit_line = np.array([x_data.min(), x_data.max()])
-        y_fit_line = a * x_fit_line + b
-        plt.plot(x_fit_line, y_fit_line, color='red', label='linear line')
+    The plots are rendered by a `PlotPipeline` in the background, so the Excel file is written without waiting
+    for them. `on_complete` is only called once every plot has been saved.
 
-        plt.scatter(results_plot["yield_force_x"], results_plot["yield_force_y"], color='black', label="YF")
-        plt.legend()
-        plt.savefig(output_image)
-        plt.close()
+    With `use_cache`, the results are also stored in a `ResultCache` next to the Excel file, and files that have not
+    changed since a previous run with the same parameters are neither analyzed nor plotted again.
 
-    except Exception as e:
-        logging.error(f"Error in create_scatter_plot: {e}")
-        plt.close()
-        return None
+    With `use_store`, every run is also recorded in a `ResultStore` next to the Excel file, with its parameters and,
+    for each file, its hash, best stiffness window and analysis time; the Excel file is then exported from the run's
+    rows in the store.
 
+    Setting `cancel_event` stops the analysis between two files. The results of the files analyzed so far are still
+    written and plotted, the other files are neither reported as failed nor written.
 
-def save_files(file_path, progress_callback, on_complete, min_window_size, max_window_size, failed_files_callback, preload=DEFAULT_PRELOAD,
-               YFC=DEFAULT_Yield_Force_Constant, disp_c=DEFAULT_Displacement_Constant):
-    """
-    Analyzes all CSV files in a specified folder and writes the results to an Excel file.
+    Matplotlib is only imported when plots are rendered.
+
+    With `profile`, the time and peak memory of each stage of each analyzed file are recorded, their percentiles
+    are logged at the end, and a Chrome trace is written next to the Excel file (see `profiling`).
 
     Args:
         file_path (str): The path to the folder containing the CSV files.
@@ -212,82 +739,167 @@ def save_files(file_path, progress_callback, on_complete, min_window_size, max_w
         max_window_size (int): The maximum size of the linear regression window.
         failed_files_callback (function): A callback function to update the list of failed files.
         preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+        engine (str, optional): The stiffness window search engine. Defaults to `DEFAULT_WINDOW_ENGINE`.
+        workers (int, optional): The number of worker processes. Defaults to `DEFAULT_WORKERS`.
+        plot_mode (str, optional): Which plots to render, one of `PLOT_MODES`. Defaults to `DEFAULT_PLOT_MODE`.
+        plot_workers (int, optional): The number of plot rendering threads. Defaults to `DEFAULT_PLOT_WORKERS`.
+        use_cache (bool, optional): Whether to reuse and store cached results. Defaults to `DEFAULT_USE_CACHE`.
+        sidecar (bool, optional): Whether to read the data through binary sidecar files. Defaults to `DEFAULT_USE_SIDECAR`.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        result_callback (function, optional): Called with the outcome of each file as soon as it is available, in completion order.
+        output_formats (tuple, optional): The formats of the result files. Defaults to `DEFAULT_OUTPUT_FORMATS`.
+        profile (bool, optional): Whether to profile the analysis stages. Defaults to `DEFAULT_PROFILE`.
+        profile_memory (bool, optional): Whether profiling measures peak memory. Defaults to `DEFAULT_PROFILE_MEMORY`.
+        use_store (bool, optional): Whether to record the run in the result store. Defaults to `DEFAULT_USE_STORE`.
+        cancel_event (threading.Event, optional): Cancels the analysis when set, see `run_batch`.
+        outlier_threshold (float, optional): The modified z-score limit of the "outliers" plot mode. Defaults to `DEFAULT_OUTLIER_THRESHOLD`.
+        point_budget (int, optional): The maximum number of points drawn per plot. Defaults to `DEFAULT_PLOT_POINT_BUDGET`.
+        csv_engine (str, optional): The pandas CSV parser engine; None picks the fastest available. Defaults to `DEFAULT_CSV_ENGINE`.
+        chunk_rows (int, optional): The number of rows parsed at a time when reading in chunks. Defaults to `DEFAULT_CHUNK_ROWS`.
+        chunked_min_bytes (int, optional): The file size from which files are read in chunks. Defaults to `CHUNKED_READ_MIN_BYTES`.
     """
+    if plot_mode not in PLOT_MODES:
+        raise ValueError(f"Unknown plot mode '{plot_mode}', expected one of {PLOT_MODES}.")
+
     all_results = []
     png_dir = get_resource_path(file_path + OUTPUT_IMAGE_DIR)
-    os.makedirs(png_dir, exist_ok=True)
+    if plot_mode != "none":
+        os.makedirs(png_dir, exist_ok=True)
 
-    files = []
+    files = find_data_files(file_path)
     failed_files = []
 
-    for root, _, filenames in os.walk(file_path):
-        for filename in filenames:
-            if filename.endswith("Data.csv"):
-                files.append(os.path.join(root, filename))
-
     total_files = len(files)
 
+    analysis_kwargs = dict(x_column=x_column, y_column=y_column, min_window_size=min_window_size, max_window_size=max_window_size,
+                           preload=preload, YFC=YFC, dispc=disp_c, engine=engine)
+    # The reading options do not change the results, so they are not part of the cache and store parameters.
+    read_kwargs = dict(csv_engine=csv_engine, chunk_rows=chunk_rows, chunked_min_bytes=chunked_min_bytes)
+    cache = ResultCache(get_resource_path(file_path + CACHE_SUFFIX), file_path, ANALYSIS_VERSION) if use_cache else None
+    cache_key = params_key(**analysis_kwargs)
+    report = ProfileReport() if profile else None
+    was_tracing = tracemalloc.is_tracing()
+
+    store = None
+    if use_store:
+        store_path = get_resource_path(file_path + STORE_SUFFIX)
+        try:
+            store = ResultStore(store_path)
+            param_set = store.param_set(**analysis_kwargs)
+            run = store.start_run(file_path, ANALYSIS_VERSION, **analysis_kwargs)
+        except Exception as e:
+            logging.error(f"Error opening result store {store_path}: {e}")
+            if store:
+                store.close()
+            store = None
+
+    outcomes = [None] * total_files
+    pending = []
     for index, f in enumerate(files):
+        file_name = os.path.basename(os.path.dirname(f))
+        row = cache.lookup(f, cache_key) if cache else None
+        png_current = cache and cache.has_png(f, cache_key, os.path.join(png_dir, file_name + '.png'))
+        if row is not None and (plot_mode != "all" or png_current):
+            outcomes[index] = {"file": f, "name": file_name, "row": row, "results_plot": None, "error": None, "png_current": png_current,
+                               "cached": True, "hash": cache.content_hash(f)}
+            if store:
+                previous = store.previous_result(outcomes[index]["hash"], param_set)
+                if previous and previous["best_start"] is not None:
+                    outcomes[index]["window"] = (previous["best_start"], previous["best_end"])
+                store.add(run, index, outcomes[index])
+            if result_callback:
+                result_callback(outcomes[index])
+        else:
+            pending.append(index)
+    cached_files = total_files - len(pending)
+    if cached_files:
+        logging.info(f"Reusing cached results for {cached_files} of {total_files} files")
+        progress_callback(cached_files, total_files)
+
+    pipeline = None
+    if plot_mode != "none":
+        from plotting import PlotPipeline
+        pipeline = PlotPipeline(plot_workers)
+    plotted = []
+
+    def plot(outcome):
+        pipeline.submit(plot_outcome, outcome, png_dir, analysis_kwargs, report, point_budget, read_kwargs)
+        plotted.append(outcome["file"])
+
+    def on_outcome(index, outcome):
+        outcomes[pending[index]] = outcome
+        if store:
+            store.add(run, pending[index], outcome)
+        if report and outcome["profile"]:
+            report.add(outcome["profile"])
+        if result_callback:
+            result_callback(outcome)
+        if plot_mode == "all":
+            plot(outcome)
+
+    def on_progress(current_step, max_steps):
+        progress_callback(cached_files + current_step, total_files)
+
+    run_batch([files[index] for index in pending], min_window_size, max_window_size, preload=preload, YFC=YFC, disp_c=disp_c,
+              engine=engine, sidecar=sidecar, x_column=x_column, y_column=y_column, workers=workers, progress_callback=on_progress,
+              outcome_callback=on_outcome, profile=profile, profile_memory=profile_memory, hash_file=store is not None,
+              cancel_event=cancel_event, **read_kwargs)
+    if cancel_event is not None and cancel_event.is_set():
+        skipped = sum(outcome is None for outcome in outcomes)
+        logging.info(f"Analysis cancelled, {skipped} of {total_files} files were not analyzed")
+    for index in pending:
+        if cache and outcomes[index] and outcomes[index]["row"]:
+            cache.store(outcomes[index]["file"], cache_key, outcomes[index]["row"], digest=outcomes[index]["hash"])
+    outcomes = [outcome for outcome in outcomes if outcome is not None]
+    for outcome in outcomes:
+        if outcome["row"]:
+            all_results.append(outcome["row"])
+        else:
+            failed_files.append(os.path.basename(outcome["file"]))
+
+    if plot_mode == "outliers":
+        succeeded = [outcome for outcome in outcomes if outcome["row"]]
+        outliers = find_outliers([outcome["row"] for outcome in succeeded], outlier_threshold)
+        for index, outcome in enumerate(succeeded):
+            if index in outliers and not outcome.get("png_current"):
+                plot(outcome)
+        for outcome in outcomes:
+            if not outcome["row"]:
+                plot(outcome)
+
+    excel_profile = SpecimenProfile(None, trace_memory=profile_memory) if report else None
+    with stage(excel_profile, "excel"):
+        if store:
+            try:
+                store.finish_run(run)
+                all_results = store.run_rows(run)
+            except Exception as e:
+                logging.error(f"Error writing results to {store.db_path}: {e}")
+            store.close()
+        write_results(all_results, get_resource_path(file_path), HEADERS, formats=output_formats,
+                      progress_callback=lambda current_step, max_steps: progress_callback(current_step + total_files, total_files * 2))
+
+    if pipeline is not None:
+        pipeline.close()
+
+    if report:
+        report.add(excel_profile.records)
+        if not was_tracing and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        report.log_summary()
+        trace_path = get_resource_path(file_path + PROFILE_SUFFIX)
         try:
-            file_name = os.path.basename(os.path.dirname(f))
-            output_image = get_resource_path(os.path.join(png_dir, file_name + '.png'))
-            analysis_output = analyse_data(f, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, min_window_size=min_window_size,
-                                           max_window_size=max_window_size, preload=preload, YFC=YFC, dispc=disp_c)
-            result = analysis_output["results"]
-            my_plot = analysis_output["results_plot"]
-            create_scatter_plot(title=file_name, output_image=output_image, results_plot=my_plot)
-
-            if result:
-                all_results.append([file_name] + result)
-            else:
-                failed_files.append(os.path.basename(f))
+            report.write_trace(trace_path)
+            logging.info(f"Profile trace saved to {trace_path}")
         except Exception as e:
-            logging.error(f"Error processing file {f}: {e}")
-            failed_files.append(os.path.basename(f))
-        progress_callback(index + 1, total_files)
-
-    wb = Workbook()
-    ws = wb.active
-    headers = ["File Name", "Max Force", "Stiffness", "Yield force", "Postyield Displacement", "Work to fracture"]
-    ws.append(headers)
-    last_first_char = None
-    for index, entry in enumerate(all_results):
-        file_name = entry[0]
-        match = re.match(r"([A-Za-z]+)", file_name)
-        current_first_char = match.group(1) if match else ''
-        if last_first_char is not None and current_first_char != last_first_char:
-            ws.append([])
-            ws.append([])
-        ws.append(entry)
-        last_first_char = current_first_char
-        progress_callback(index + 1 + total_files, total_files * 2)
-
-    ws.column_dimensions['A'].width = Excel_Type[0]
-    ws.column_dimensions['B'].width = Excel_Type[1]
-    ws.column_dimensions['C'].width = Excel_Type[2]
-    ws.column_dimensions['D'].width = Excel_Type[3]
-    ws.column_dimensions['E'].width = Excel_Type[4]
-    ws.column_dimensions['F'].width = Excel_Type[5]
-
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                         top=Side(style='thin'), bottom=Side(style='thin'))
-
-    for row in range(1, ws.max_row + 1):
-        for col in range(1, ws.max_column + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = thin_border
-
-    for row in range(2, ws.max_row + 1):
-        for col in range(2, ws.max_column + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.number_format = '0.0000'
-    try:
-        excel_file_path = get_resource_path(file_path + ".xlsx")
-        wb.save(excel_file_path)
-        logging.info(f"Excel file saved to {excel_file_path}")
-    except Exception as e:
-        logging.error(f"Error saving excel file: {e}")
+            logging.error(f"Error saving profile trace: {e}")
+
+    if cache:
+        for f in plotted:
+            if os.path.exists(os.path.join(png_dir, os.path.basename(os.path.dirname(f)) + '.png')):
+                cache.store_png(f, cache_key)
+        cache.save()
 
     failed_files_callback(failed_files)
     on_complete()
@@ -0,0 +1,439 @@
+"""
+Benchmark module, used to measure how the analysis stages scale with the curve length and the number of files.
+
+For each curve length, a synthetic dataset is generated (see `synthetic`) and every stage of the analysis is timed
+separately: parse, trim, window search, yield search, fracture scan, AUC, plot and Excel. The results can be saved
+as JSON, and compared with a saved baseline to detect regressions.
+
+Usage:
+    python -m benchmark --samples 500 5000 50000 --specimens 20 --save baseline.json
+    python -m benchmark --samples 500 5000 50000 --specimens 20 --baseline baseline.json --threshold 1.5
+
+The exit code is 1 when a stage is slower than `threshold` times its baseline.
+
+With `--startup`, the GUI startup time is measured instead: the time from the first import to the first drawn
+window, in a fresh interpreter, checked against `--budget`:
+    python -m benchmark --startup --budget 1.0
+
+With `--decimation`, the plot of a single curve of each length is rendered with every point and decimated to
+`--point-budget` points (see `plotting.decimate`), and the render times and PNG sizes are compared:
+    python -m benchmark --decimation --samples 5000 50000 500000 --point-budget 5000
+
+With `--cohort`, `--specimens` in-memory curves of each length are analyzed one call per curve (`analyse_curve`)
+and all at once (see `cohort.analyse_ragged`), and the times are compared:
+    python -m benchmark --cohort --samples 40 200 1000 --specimens 3000
+
+With `--streaming`, `--specimens` noisy curves of each length are fed to a `streaming.StreamingAnalyzer` a chunk at
+a time, and its final results are checked against `analyse_curve` on the whole curve; the exit code is 1 when any
+differ, e.g. because a noise spike was taken for the fracture:
+    python -m benchmark --streaming --samples 500 --specimens 200 --noise 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+import numpy as np
+
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_WINDOW_ENGINE, WINDOW_ENGINES, DEFAULT_PLOT_POINT_BUDGET)
+from synthetic import generate_dataset, generate_curve
+
+STAGES = ("parse", "trim", "window", "yield", "fracture", "auc", "plot", "excel")
+"""The timed stages, in pipeline order."""
+MIN_REGRESSION_SECONDS = 0.001
+"""Per-file slowdowns smaller than this are ignored by the regression check, as timer noise."""
+STARTUP_BUDGET = 1.0
+"""The target time in seconds from the first import of the GUI to its first drawn window."""
+_STARTUP_SCRIPT = """
+import os, sys, time
+start = time.perf_counter()
+import tkinter as tk
+import gui
+imported = time.perf_counter() - start
+try:
+    root = tk.Tk()
+except tk.TclError:
+    print(imported, -1, len(sys.modules))
+else:
+    gui.AnalysisApp(root)
+    root.update()
+    print(imported, time.perf_counter() - start, len(sys.modules))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def benchmark_files(files, min_window_size=DEFAULT_MIN_WINDOW_SIZE, max_window_size=DEFAULT_MAX_WINDOW_SIZE,
+                    preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant, dispc=DEFAULT_Displacement_Constant,
+                    engine=DEFAULT_WINDOW_ENGINE, plot=True, output_dir=None):
+    """
+    Times each analysis stage over a list of files.
+
+    Args:
+        files (list): The paths of the CSV files.
+        plot (bool, optional): Whether to time the plot stage. Defaults to True.
+        output_dir (str, optional): The folder for the plots and the Excel file. Defaults to a temporary folder.
+
+    Returns:
+        dict: The total seconds spent in each stage.
+    """
+    from analysis import (find_best_window, trim_curve, find_yield_point, find_fracture_index, work_to_fracture,
+                          HEADERS)
+    from ingest import read_xy
+    from output import write_excel
+
+    output_dir = output_dir or tempfile.mkdtemp()
+    timings = dict.fromkeys(STAGES, 0.0)
+    rows = []
+
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[stage] += time.perf_counter() - start
+        return value
+
+    for f in files:
+        name = os.path.basename(os.path.dirname(f))
+        x_raw, y_raw = timed("parse", read_xy, f)
+        x_data, y_data = timed("trim", trim_curve, x_raw, y_raw, preload)
+        a, b, best_start, best_end = timed("window", find_best_window, x_data, y_data, min_window_size, max_window_size, engine)
+        max_value = y_data.max()
+        next_x, next_y = timed("yield", find_yield_point, x_data, y_data, a, b, best_end, max_value, x_data.max(), YFC, dispc)
+        fracture_index = timed("fracture", find_fracture_index, y_data)
+        auc = timed("auc", work_to_fracture, x_data, y_data, fracture_index)
+        postyield = x_data[fracture_index] - next_x if next_x is not None else None
+        rows.append([name, max_value, a, next_y, postyield, auc])
+        if plot:
+            from plotting import create_scatter_plot
+
+            results_plot = {"x_data": x_data, "y_data": y_data, "a": a, "b": b, "best_start": best_start, "best_end": best_end,
+                            "yield_force_x": next_x, "yield_force_y": next_y}
+            timed("plot", create_scatter_plot, name, "x", "y", os.path.join(output_dir, name + ".png"), results_plot)
+
+    timed("excel", write_excel, rows, os.path.join(output_dir, "benchmark.xlsx"), HEADERS)
+    return timings
+
+
+def run_benchmark(sample_counts, specimens=10, repeat=1, seed=0, plot=True, **analysis_kwargs):
+    """
+    Benchmarks the analysis stages for several curve lengths.
+
+    Args:
+        sample_counts (list): The numbers of samples per curve.
+        specimens (int, optional): The number of files per curve length. Defaults to 10.
+        repeat (int, optional): The number of runs; the fastest time of each stage is kept. Defaults to 1.
+        seed (int, optional): The random seed of the synthetic data. Defaults to 0.
+        plot (bool, optional): Whether to time the plot stage. Defaults to True.
+        **analysis_kwargs: The analysis parameters passed to `benchmark_files`.
+
+    Returns:
+        dict: The environment and, for each curve length, the per-file seconds of each stage and the throughput.
+    """
+    report = {"python": platform.python_version(), "numpy": np.__version__, "specimens": specimens, "sizes": {}}
+    for samples in sample_counts:
+        root = tempfile.mkdtemp(prefix="3pb-bench-")
+        try:
+            files = generate_dataset(os.path.join(root, "data"), specimens, samples, seed)
+            best = None
+            for _ in range(repeat):
+                timings = benchmark_files(files, plot=plot, output_dir=root, **analysis_kwargs)
+                best = timings if best is None else {stage: min(best[stage], timings[stage]) for stage in STAGES}
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+        total = sum(best.values())
+        report["sizes"][str(samples)] = {
+            "per_file": {stage: best[stage] / specimens for stage in STAGES},
+            "total_seconds": total,
+            "files_per_second": specimens / total if total else float("inf"),
+            "samples_per_second": specimens * samples / total if total else float("inf"),
+        }
+    return report
+
+
+def measure_startup(repeat=3):
+    """
+    Measures the GUI startup time in fresh interpreters, run in a temporary folder so the log file is not touched.
+
+    Args:
+        repeat (int, optional): The number of runs; the fastest is kept. Defaults to 3.
+
+    Returns:
+        dict: The seconds to import the GUI module, the seconds to the first drawn window (None without a display),
+        and the number of loaded modules.
+    """
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [module_dir, os.environ.get("PYTHONPATH")])))
+    runs = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT], cwd=cwd, env=env, capture_output=True, text=True, check=True)
+            imported, window, modules = output.stdout.split()
+            runs.append((float(imported), float(window), int(modules)))
+    imported, window, modules = min(runs)
+    return {"import_seconds": imported, "window_seconds": window if window >= 0 else None, "modules": modules}
+
+
+def benchmark_decimation(sample_counts, point_budget=DEFAULT_PLOT_POINT_BUDGET, repeat=1, seed=0):
+    """
+    Compares the plots of synthetic curves rendered with every point and decimated to a point budget.
+
+    Args:
+        sample_counts (list): The numbers of samples per curve.
+        point_budget (int, optional): The maximum number of drawn points. Defaults to `DEFAULT_PLOT_POINT_BUDGET`.
+        repeat (int, optional): The number of renders; the fastest is kept. Defaults to 1.
+        seed (int, optional): The random seed of the synthetic data. Defaults to 0.
+
+    Returns:
+        dict: For each curve length, the seconds and PNG bytes of the "full" and "decimated" plots.
+    """
+    from analysis import analyse_curve
+    from plotting import create_scatter_plot
+
+    report = {"point_budget": point_budget, "sizes": {}}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for samples in sample_counts:
+            displacement, force, _ = generate_curve(samples, np.random.default_rng(seed))
+            results_plot = analyse_curve(displacement, force, DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD,
+                                         DEFAULT_Yield_Force_Constant, DEFAULT_Displacement_Constant)["results_plot"]
+            result = {}
+            for name, budget in (("full", None), ("decimated", point_budget)):
+                path = os.path.join(output_dir, f"{samples}-{name}.png")
+                seconds = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    create_scatter_plot(str(samples), "x", "y", path, results_plot, point_budget=budget)
+                    seconds.append(time.perf_counter() - start)
+                result[name] = {"seconds": min(seconds), "bytes": os.path.getsize(path)}
+            report["sizes"][str(samples)] = result
+    return report
+
+
+def benchmark_cohort(sample_counts, specimens=1000, repeat=1, seed=0):
+    """
+    Compares the analysis of synthetic curves one call per curve and as a single cohort.
+
+    Args:
+        sample_counts (list): The numbers of samples per curve.
+        specimens (int, optional): The number of curves per curve length. Defaults to 1000.
+        repeat (int, optional): The number of runs; the fastest is kept. Defaults to 1.
+        seed (int, optional): The random seed of the synthetic data. Defaults to 0.
+
+    Returns:
+        dict: For each curve length, the seconds of the "per_curve" and "cohort" analyses.
+    """
+    from analysis import analyse_curve
+    from cohort import analyse_ragged, to_ragged
+
+    report = {"specimens": specimens, "sizes": {}}
+    for samples in sample_counts:
+        rng = np.random.default_rng(seed)
+        curves = [generate_curve(samples, rng)[:2] for _ in range(specimens)]
+        x, y, offsets = to_ragged(curves)
+
+        def per_curve():
+            for displacement, force in curves:
+                try:
+                    analyse_curve(displacement, force, DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD,
+                                  DEFAULT_Yield_Force_Constant, DEFAULT_Displacement_Constant)
+                except Exception:
+                    pass
+
+        result = {}
+        for name, run in (("per_curve", per_curve), ("cohort", lambda: analyse_ragged(x, y, offsets))):
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                seconds.append(time.perf_counter() - start)
+            result[name] = min(seconds)
+        report["sizes"][str(samples)] = result
+    return report
+
+
+def check_streaming(sample_counts, specimens=200, noise=0.2, chunk_rows=25, seed=0):
+    """
+    Checks that the streaming analysis of noisy synthetic curves gives the same results as the batch analysis.
+
+    Args:
+        sample_counts (list): The numbers of samples per curve.
+        specimens (int, optional): The number of curves per curve length. Defaults to 200.
+        noise (float, optional): The standard deviation of the force noise in N. Defaults to 0.2.
+        chunk_rows (int, optional): The number of samples added at a time. Defaults to 25.
+        seed (int, optional): The random seed of the synthetic data. Defaults to 0.
+
+    Returns:
+        dict: For each curve length, the number of curves whose fracture was detected while streaming, and the list
+        of the curves whose results differ, with both results.
+    """
+    from analysis import analyse_curve
+    from streaming import StreamingAnalyzer
+
+    analysis_kwargs = dict(min_window_size=DEFAULT_MIN_WINDOW_SIZE, max_window_size=DEFAULT_MAX_WINDOW_SIZE,
+                           preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant, dispc=DEFAULT_Displacement_Constant)
+    report = {"noise": noise, "sizes": {}}
+    for samples in sample_counts:
+        rng = np.random.default_rng(seed)
+        detected = 0
+        mismatches = []
+        for index in range(specimens):
+            displacement, force, _ = generate_curve(samples, rng, noise=noise)
+            analyzer = StreamingAnalyzer(**analysis_kwargs)
+            for start in range(0, samples, chunk_rows):
+                analyzer.add(displacement[start:start + chunk_rows], force[start:start + chunk_rows])
+                if analyzer.fractured:
+                    detected += 1
+                    break
+            streamed = analyzer.finish()
+            streamed = streamed["results"] if streamed else None
+            try:
+                batch = analyse_curve(displacement, force, **analysis_kwargs)["results"]
+            except Exception:
+                batch = None
+            if streamed != batch:
+                mismatches.append({"curve": index, "samples_streamed": analyzer.samples,
+                                   "streaming": None if streamed is None else [float(v) for v in streamed],
+                                   "batch": None if batch is None else [float(v) for v in batch]})
+        report["sizes"][str(samples)] = {"detected": detected, "mismatches": mismatches}
+    return report
+
+
+def find_regressions(report, baseline, threshold=1.5):
+    """
+    Compares a report with a baseline report.
+
+    Args:
+        report (dict): The current `run_benchmark` report.
+        baseline (dict): The baseline report.
+        threshold (float, optional): The allowed slowdown factor. Defaults to 1.5.
+
+    Returns:
+        list: A description of each stage that is more than `threshold` times slower than its baseline.
+    """
+    regressions = []
+    for samples, result in report["sizes"].items():
+        base = baseline.get("sizes", {}).get(samples)
+        if base is None:
+            continue
+        for stage, seconds in result["per_file"].items():
+            base_seconds = base["per_file"].get(stage)
+            if base_seconds is None or seconds - base_seconds < MIN_REGRESSION_SECONDS:
+                continue
+            if seconds > threshold * base_seconds:
+                regressions.append(f"{stage} at {samples} samples: {seconds * 1000:.2f} ms per file, "
+                                   f"baseline {base_seconds * 1000:.2f} ms ({seconds / base_seconds:.1f}x)")
+    return regressions
+
+
+def format_report(report):
+    """Formats a report as a text table of milliseconds per file."""
+    lines = ["samples  " + "".join(f"{stage:>10}" for stage in STAGES) + f"{'files/s':>10}{'samples/s':>12}"]
+    for samples, result in report["sizes"].items():
+        cells = "".join(f"{result['per_file'][stage] * 1000:>10.2f}" for stage in STAGES)
+        lines.append(f"{samples:>7}  {cells}{result['files_per_second']:>10.1f}{result['samples_per_second']:>12.0f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Runs the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmarks the analysis stages on synthetic data.")
+    parser.add_argument("--samples", type=int, nargs="+", default=[500, 5000, 50000], help="The curve lengths to benchmark.")
+    parser.add_argument("--specimens", type=int, default=10, help="The number of files per curve length.")
+    parser.add_argument("--repeat", type=int, default=1, help="The number of runs; the fastest is kept.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed of the synthetic data.")
+    parser.add_argument("--engine", choices=WINDOW_ENGINES, default=DEFAULT_WINDOW_ENGINE, help="The stiffness window search engine.")
+    parser.add_argument("--no-plot", dest="plot", action="store_false", help="Skip the plot stage.")
+    parser.add_argument("--startup", action="store_true", help="Measure the GUI startup time instead of the analysis stages.")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET, help="The GUI startup time budget in seconds.")
+    parser.add_argument("--decimation", action="store_true", help="Compare full and decimated plots instead of the analysis stages.")
+    parser.add_argument("--point-budget", type=int, default=DEFAULT_PLOT_POINT_BUDGET, help="The point budget of the decimated plots.")
+    parser.add_argument("--cohort", action="store_true", help="Compare per-curve and cohort analyses instead of the analysis stages.")
+    parser.add_argument("--streaming", action="store_true", help="Check streaming results against batch results instead.")
+    parser.add_argument("--noise", type=float, default=0.2, help="The force noise of the --streaming curves, in N.")
+    parser.add_argument("--save", help="Save the report to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the report with this JSON baseline.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="The allowed slowdown factor against the baseline.")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        startup = measure_startup(args.repeat)
+        print(f"GUI import: {startup['import_seconds'] * 1000:.0f} ms, {startup['modules']} modules loaded")
+        seconds = startup["window_seconds"]
+        if seconds is None:
+            print("No display, the window was not created; the budget applies to the import time.")
+            seconds = startup["import_seconds"]
+        else:
+            print(f"First window: {seconds * 1000:.0f} ms (budget {args.budget * 1000:.0f} ms)")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(startup, f, indent=2)
+        if seconds > args.budget:
+            print(f"Startup over budget: {seconds * 1000:.0f} ms > {args.budget * 1000:.0f} ms", file=sys.stderr)
+            return 1
+        return 0
+
+    if args.decimation:
+        decimation = benchmark_decimation(args.samples, args.point_budget, args.repeat, args.seed)
+        print(f"Plots with every point and decimated to {args.point_budget} points:")
+        print(f"{'samples':>9}{'full ms':>10}{'full KiB':>10}{'dec. ms':>10}{'dec. KiB':>10}{'speedup':>9}")
+        for samples, result in decimation["sizes"].items():
+            full, decimated = result["full"], result["decimated"]
+            print(f"{samples:>9}{full['seconds'] * 1000:>10.0f}{full['bytes'] / 1024:>10.0f}{decimated['seconds'] * 1000:>10.0f}"
+                  f"{decimated['bytes'] / 1024:>10.0f}{full['seconds'] / decimated['seconds']:>8.1f}x")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(decimation, f, indent=2)
+        return 0
+
+    if args.streaming:
+        streaming = check_streaming(args.samples, args.specimens, args.noise, seed=args.seed)
+        failed = False
+        for samples, result in streaming["sizes"].items():
+            print(f"{samples} samples: fracture detected while streaming in {result['detected']}/{args.specimens} curves, "
+                  f"{len(result['mismatches'])} results differ from the batch analysis")
+            for mismatch in result["mismatches"]:
+                print(f"Mismatch: {mismatch}", file=sys.stderr)
+            failed = failed or bool(result["mismatches"])
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(streaming, f, indent=2)
+        return 1 if failed else 0
+
+    if args.cohort:
+        cohort = benchmark_cohort(args.samples, args.specimens, args.repeat, args.seed)
+        print(f"Analysis of {args.specimens} curves, one call per curve and as a single cohort:")
+        print(f"{'samples':>9}{'per-curve ms':>14}{'cohort ms':>11}{'speedup':>9}")
+        for samples, result in cohort["sizes"].items():
+            print(f"{samples:>9}{result['per_curve'] * 1000:>14.0f}{result['cohort'] * 1000:>11.0f}"
+                  f"{result['per_curve'] / result['cohort']:>8.1f}x")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(cohort, f, indent=2)
+        return 0
+
+    report = run_benchmark(args.samples, args.specimens, args.repeat, args.seed, args.plot, engine=args.engine)
+    print("Milliseconds per file:")
+    print(format_report(report))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
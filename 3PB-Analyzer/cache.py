@@ -0,0 +1,175 @@
+"""
+Result cache module, used to skip the analysis of files that have not changed since the last run.
+
+The cache is a JSON file stored next to the output Excel file. Each data file is identified by its path relative
+to the root folder and validated by its size, modification time and, when those differ, its content hash. Results
+are stored per parameter set, and the whole cache is discarded when the analysis version changes.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+
+from config import CACHE_MAX_PARAM_SETS
+
+CACHE_FORMAT = 1
+"""The version of the cache file layout."""
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """
+    Computes the SHA-256 hash of a file's content.
+
+    Args:
+        path (str): The path to the file.
+        chunk_size (int, optional): The number of bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_key(**params):
+    """
+    Builds the cache key of a set of analysis parameters.
+
+    Returns:
+        str: A canonical JSON encoding of the parameters.
+    """
+    return json.dumps(params, sort_keys=True)
+
+
+class ResultCache:
+    """
+    A persistent cache of analysis result rows.
+
+    Eviction policy: entries of files that were not seen during a run are dropped when the cache is saved, and
+    only the `CACHE_MAX_PARAM_SETS` most recently used parameter sets are kept for each file.
+    """
+
+    def __init__(self, cache_path, root, version):
+        """
+        Loads the cache, or starts an empty one if it is missing, unreadable or from another analysis version.
+
+        Args:
+            cache_path (str): The path to the cache file.
+            root (str): The root folder of the data files; paths are stored relative to it.
+            version (int): The analysis version; a cache written by another version is discarded.
+        """
+        self.cache_path = cache_path
+        self.root = root
+        self.version = version
+        self._files = {}
+        self._seen = set()
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("format") == CACHE_FORMAT and data.get("version") == version:
+                self._files = data.get("files", {})
+            else:
+                logging.info(f"Discarding result cache {cache_path} from another analysis version")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Error loading result cache {cache_path}: {e}")
+
+    def _key(self, csv_file):
+        """Returns the cache key of a data file."""
+        return os.path.relpath(csv_file, self.root).replace(os.sep, "/")
+
+    def _validate(self, csv_file):
+        """
+        Checks that a file has not changed since it was cached, dropping its entries if it has.
+
+        Returns:
+            dict or None: The file's cache record, or None if the file is new or has changed.
+        """
+        key = self._key(csv_file)
+        self._seen.add(key)
+        record = self._files.get(key)
+        if record is None:
+            return None
+        stat = os.stat(csv_file)
+        if record["size"] == stat.st_size and record["mtime_ns"] == stat.st_mtime_ns:
+            return record
+        if record["size"] == stat.st_size and record["hash"] == file_hash(csv_file):
+            record["mtime_ns"] = stat.st_mtime_ns
+            return record
+        del self._files[key]
+        return None
+
+    def lookup(self, csv_file, params):
+        """
+        Looks up the cached result row of a file.
+
+        Args:
+            csv_file (str): The path to the data file.
+            params (str): The parameter key from `params_key`.
+
+        Returns:
+            list or None: The cached Excel row, or None on a cache miss.
+        """
+        record = self._validate(csv_file)
+        if record is None or params not in record["results"]:
+            return None
+        entry = record["results"][params]
+        entry["used"] = time.time()
+        return entry["row"]
+
+    def has_png(self, csv_file, params, png_path):
+        """Checks whether `png_path` exists and was rendered from the file's current data with these parameters."""
+        record = self._files.get(self._key(csv_file))
+        return record is not None and record.get("png") == params and os.path.exists(png_path)
+
+    def content_hash(self, csv_file):
+        """Returns the content hash recorded for a file, or None if it is not cached."""
+        record = self._files.get(self._key(csv_file))
+        return record["hash"] if record is not None else None
+
+    def store(self, csv_file, params, row, digest=None):
+        """
+        Stores the result row of a file.
+
+        Args:
+            csv_file (str): The path to the data file.
+            params (str): The parameter key from `params_key`.
+            row (list): The Excel row.
+            digest (str, optional): The file's `file_hash`, if it is already known.
+        """
+        key = self._key(csv_file)
+        self._seen.add(key)
+        stat = os.stat(csv_file)
+        record = self._files.get(key)
+        if record is None or record["size"] != stat.st_size or record["mtime_ns"] != stat.st_mtime_ns:
+            record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest or file_hash(csv_file), "results": {}}
+            self._files[key] = record
+        record["results"][params] = {"row": [row[0]] + [None if v is None else float(v) for v in row[1:]], "used": time.time()}
+        if len(record["results"]) > CACHE_MAX_PARAM_SETS:
+            oldest = sorted(record["results"], key=lambda p: record["results"][p]["used"])
+            for p in oldest[:len(record["results"]) - CACHE_MAX_PARAM_SETS]:
+                del record["results"][p]
+
+    def store_png(self, csv_file, params):
+        """Records that the file's plot was rendered with these parameters."""
+        record = self._files.get(self._key(csv_file))
+        if record is not None:
+            record["png"] = params
+
+    def save(self):
+        """Writes the cache to disk, evicting the files that were not seen since it was loaded."""
+        files = {key: record for key, record in self._files.items() if key in self._seen}
+        data = {"format": CACHE_FORMAT, "version": self.version, "files": files}
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logging.error(f"Error saving result cache {self.cache_path}: {e}")
@@ -0,0 +1,278 @@
+"""
+Chunked reader module, used to trim very large CSV files without loading them whole.
+
+The file is parsed a chunk of rows at a time (see `ingest.iter_csv_chunks`). A `RegionTracker` follows, chunk by
+chunk, everything `analysis.trim_curve` needs: the peak, the highest non-positive force before it, the first
+force reaching the preload after that, the first rise after the peak (the fracture) and the last force reaching
+the preload. Only the samples that can still belong to the loading region are buffered, so the peak memory is
+about two chunks plus the loading region, whatever the size of the file. The trimmed curve is identical to
+`trim_curve` on the whole file.
+
+Up to a chunk of samples after the fracture is buffered, in case the force rises again to a new peak. When more
+are dropped and a higher peak comes after them, the region moves to that peak; if it may start among the dropped
+samples, the file is read a second time, keeping only the new region.
+"""
+
+import numpy as np
+
+from ingest import iter_csv_chunks
+from config import DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_PRELOAD, DEFAULT_CHUNK_ROWS
+
+
+def _best_nonpositive(force, offset):
+    """
+    Finds the first occurrence of the highest force <= 0.
+
+    Returns:
+        tuple or None: The (force, index + `offset`), or None if no force is <= 0.
+    """
+    candidates = np.flatnonzero(force <= 0)
+    if not len(candidates):
+        return None
+    index = int(candidates[np.argmax(force[candidates])])
+    return force[index], offset + index
+
+
+def _later_if_higher(earlier, later):
+    """Returns the higher of two (force, index) candidates, `earlier` on ties or if `later` is None."""
+    if later is not None and (earlier is None or later[0] > earlier[0]):
+        return later
+    return earlier
+
+
+class RegionTracker:
+    """Finds the loading region of a curve read in chunks, as `trim_curve` would on the whole curve."""
+
+    def __init__(self, preload=DEFAULT_PRELOAD, tail_limit=DEFAULT_CHUNK_ROWS):
+        """
+        Args:
+            preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+            tail_limit (int, optional): The number of samples after the fracture kept in the buffer. Defaults to
+                `DEFAULT_CHUNK_ROWS`.
+        """
+        self.preload = preload
+        self.tail_limit = tail_limit
+        self.samples = 0
+        self.max_value = None
+        self.max_index = None
+        self._before_max = None  # The highest force <= 0 before the peak
+        self._after_max = None  # The highest force <= 0 after the peak
+        self._rise_index = None  # The first index from the peak whose next force does not decrease
+        self._last_reached = None  # The last index whose force reaches the preload
+        self._last_force = None
+        self._first_index = None  # The first index from `pre_index` whose force reaches the preload
+        # The buffered samples, from `self._start` to the end of the file or to the sample after the fracture.
+        self._x = []
+        self._y = []
+        self._start = 0
+        self._truncated = False
+        self.complete = True  # False once the buffer misses part of the region, which must then be read again
+
+    @property
+    def pre_index(self):
+        """The index of the first occurrence of the highest force <= 0 before the peak, 0 if there is none."""
+        return self._before_max[1] if self._before_max is not None else 0
+
+    def add(self, x_chunk, y_chunk):
+        """Processes the next chunk of samples."""
+        force = np.asarray(y_chunk, dtype=float)
+        if not len(force):
+            return
+        offset = self.samples
+
+        new_max = None
+        if not np.isnan(force).all():
+            new_max = int(np.nanargmax(force))
+            if self.max_value is not None and not force[new_max] > self.max_value:
+                new_max = None
+        if new_max is not None:
+            # Everything before the new peak, including the previous peak, is now before the peak.
+            previous_max = None
+            if self.max_value is not None and self.max_value <= 0:
+                previous_max = (self.max_value, self.max_index)
+            before_max = _later_if_higher(self._before_max, previous_max)
+            before_max = _later_if_higher(before_max, self._after_max)
+            self._before_max = _later_if_higher(before_max, _best_nonpositive(force[:new_max], offset))
+            self._after_max = _best_nonpositive(force[new_max + 1:], offset + new_max + 1)
+            self.max_value = force[new_max]
+            self.max_index = offset + new_max
+            self._rise_index = None
+        else:
+            self._after_max = _later_if_higher(self._after_max, _best_nonpositive(force, offset))
+
+        if self._rise_index is None and self.max_index is not None:
+            # The pairs of consecutive forces from the peak, including the pair across the chunk boundary.
+            if self._last_force is not None:
+                pairs, pairs_offset = np.concatenate(([self._last_force], force)), offset - 1
+            else:
+                pairs, pairs_offset = force, offset
+            start = max(self.max_index - pairs_offset, 0)
+            rising = np.flatnonzero(pairs[start + 1:] >= pairs[start:-1])
+            if len(rising):
+                self._rise_index = pairs_offset + start + int(rising[0])
+
+        reached_before = self._last_reached
+        reached = np.flatnonzero(force >= self.preload)
+        if len(reached):
+            self._last_reached = offset + int(reached[-1])
+        self._last_force = force[-1]
+        self.samples += len(force)
+
+        if self.complete:
+            self._buffer(np.asarray(x_chunk, dtype=float), force, offset, new_max is not None, reached_before)
+
+    def _buffer(self, x_chunk, force, offset, new_max, reached_before):
+        """
+        Buffers the samples of a chunk that can still belong to the loading region, and drops the others.
+
+        `reached_before` is the last index before the chunk whose force reaches the preload.
+        """
+        if self._truncated:
+            if new_max:
+                if reached_before is not None and reached_before >= self.pre_index:
+                    # The new region may start among the samples that were dropped after the previous fracture.
+                    self.complete = False
+                    self._x, self._y = [], []
+                    return
+                # No force reaches the preload from the new `pre_index` to this chunk, so the region starts in it.
+                self._x, self._y = [x_chunk], [force]
+                self._start = offset
+                self._first_index = None
+                self._truncated = False
+        else:
+            self._x.append(x_chunk)
+            self._y.append(force)
+
+        # The region starts at the first force reaching the preload from `pre_index`, which only ever moves forward.
+        pre_index = self.pre_index
+        if self._first_index is None or self._first_index < pre_index:
+            self._first_index = None
+            y = self._buffered_y()
+            reached = np.flatnonzero(y[max(pre_index - self._start, 0):] >= self.preload)
+            if len(reached):
+                self._first_index = max(pre_index, self._start) + int(reached[0])
+        self._trim_buffer(self._first_index if self._first_index is not None else pre_index, self._end())
+
+        # Past the fracture, only the next sample matters (when it turns out to be the last one), unless a new peak comes.
+        if self._rise_index is not None and self._rise_index + 2 + self.tail_limit < self._end():
+            self._trim_buffer(self._start, self._rise_index + 2)
+            self._truncated = True
+
+    def _end(self):
+        """The index after the last buffered sample."""
+        return self._start + sum(len(y) for y in self._y)
+
+    def _buffered_y(self):
+        """Joins the buffered forces into a single chunk."""
+        if len(self._y) > 1:
+            self._x = [np.concatenate(self._x)]
+            self._y = [np.concatenate(self._y)]
+        return self._y[0] if self._y else np.empty(0)
+
+    def _trim_buffer(self, start, end):
+        """Keeps the buffered samples from index `start` to (excluding) `end`."""
+        if start <= self._start and end >= self._end():
+            return
+        self._buffered_y()
+        begin = max(start - self._start, 0)
+        stop = max(end - self._start, begin)
+        # Copies, so the dropped samples are freed.
+        self._x = [self._x[0][begin:stop].copy()]
+        self._y = [self._y[0][begin:stop].copy()]
+        self._start += begin
+
+    def region(self):
+        """
+        Returns the bounds of the loading region, once every chunk has been added.
+
+        Returns:
+            tuple or None: The first and last index of the region, or None if no force reaches the preload after
+            `pre_index`. The region is empty when the last index is before the first.
+
+        Raises:
+            ValueError: If the curve has no forces, or only NaN forces.
+        """
+        if self.max_value is None:
+            raise ValueError("The force column is empty or only holds NaN values.")
+        # trim_curve ignores the last pair of samples when looking for the fracture.
+        if self._rise_index is not None and self._rise_index + 1 < self.samples - 1:
+            last_index = self._rise_index
+        else:
+            last_index = self._last_reached
+        if self.complete:
+            if self._first_index is None:
+                return None
+            return self._first_index, last_index
+        return None if last_index is None else (None, last_index)
+
+    def buffered_region(self, first_index, last_index):
+        """Returns the X and Y data of the region from the buffer."""
+        self._buffered_y()
+        begin = first_index - self._start
+        stop = max(last_index + 1 - self._start, begin)
+        return self._x[0][begin:stop].copy(), self._y[0][begin:stop].copy()
+
+
+def read_region(chunks, pre_index, last_index, preload):
+    """
+    Reads the loading region from a second pass over the chunks, when it was not fully buffered by the first.
+
+    Args:
+        chunks (iterable): The (X, Y) chunks of the whole curve.
+        pre_index (int): The index from which the region starts at the first force reaching `preload`.
+        last_index (int): The last index of the region.
+        preload (float): The preload value.
+
+    Returns:
+        tuple: The X and Y data of the region.
+    """
+    first_index = None
+    x_parts, y_parts = [], []
+    offset = 0
+    for x_chunk, y_chunk in chunks:
+        end = offset + len(y_chunk)
+        if first_index is None and end > pre_index:
+            begin = max(pre_index - offset, 0)
+            reached = np.flatnonzero(np.asarray(y_chunk[begin:], dtype=float) >= preload)
+            if len(reached):
+                first_index = offset + begin + int(reached[0])
+        if first_index is not None and first_index < end:
+            begin = max(first_index - offset, 0)
+            stop = max(min(last_index + 1 - offset, len(y_chunk)), begin)
+            x_parts.append(np.asarray(x_chunk[begin:stop], dtype=float).copy())
+            y_parts.append(np.asarray(y_chunk[begin:stop], dtype=float).copy())
+        offset = end
+        if first_index is not None and offset > last_index:
+            break
+    if first_index is None:
+        return np.empty(0), np.empty(0)
+    return np.concatenate(x_parts), np.concatenate(y_parts)
+
+
+def read_trimmed_xy(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, preload=DEFAULT_PRELOAD,
+                    chunk_rows=DEFAULT_CHUNK_ROWS, engine=None):
+    """
+    Reads the loading region of a CSV file a chunk at a time. This is `trim_curve(*read_xy(csv_file), preload)`
+    without ever holding the whole file in memory.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+        chunk_rows (int, optional): The number of rows parsed at a time. Defaults to `DEFAULT_CHUNK_ROWS`.
+        engine (str, optional): The parser engine, see `iter_csv_chunks`. Defaults to `csv_engine()`.
+
+    Returns:
+        tuple: The trimmed X and Y data.
+    """
+    tracker = RegionTracker(preload, tail_limit=chunk_rows)
+    for x_chunk, y_chunk in iter_csv_chunks(csv_file, x_column, y_column, chunk_rows, engine):
+        tracker.add(x_chunk, y_chunk)
+    region = tracker.region()
+    if region is None:
+        return np.empty(0), np.empty(0)
+    first_index, last_index = region
+    if tracker.complete:
+        return tracker.buffered_region(first_index, last_index)
+    return read_region(iter_csv_chunks(csv_file, x_column, y_column, chunk_rows, engine), tracker.pre_index, last_index, preload)
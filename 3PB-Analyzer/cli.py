@@ -0,0 +1,165 @@
+"""
+Command-line module, used to run the analysis without the GUI, e.g. on a headless server or from a scheduler.
+
+Each result row is written to the output (CSV or JSON lines) as soon as its file has been analyzed, and progress
+is reported on stderr. The result files (the Excel file by default) are written next to the folder, as with the GUI. Matplotlib is only imported
+when plots are requested, and tkinter never is.
+
+Usage:
+    python -m cli <folder> [options]
+
+The exit code is 0 when every file was analyzed, 1 when some files failed and 2 on invalid arguments.
+"""
+
+import os
+import sys
+import csv
+import json
+import logging
+import argparse
+import importlib.util
+import multiprocessing
+
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_WINDOW_ENGINE, DEFAULT_WORKERS,
+                    DEFAULT_PLOT_WORKERS, DEFAULT_USE_CACHE, DEFAULT_USE_STORE, DEFAULT_USE_SIDECAR, PLOT_MODES, WINDOW_ENGINES,
+                    OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMATS, DEFAULT_PROFILE, DEFAULT_PROFILE_MEMORY, LOG_LEVEL, DEFAULT_OUTLIER_THRESHOLD,
+                    DEFAULT_PLOT_POINT_BUDGET, CSV_ENGINES, DEFAULT_CSV_ENGINE, DEFAULT_CHUNK_ROWS, CHUNKED_READ_MIN_BYTES)
+
+STREAM_FORMATS = ("csv", "jsonl")
+"""The available formats of the streamed result rows."""
+
+
+class RowWriter:
+    """Writes result rows to a stream one at a time, flushing after each row."""
+
+    def __init__(self, stream, output_format, headers):
+        """
+        Args:
+            stream (file): The output stream.
+            output_format (str): One of `STREAM_FORMATS`.
+            headers (list): The column headers of the rows.
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self.headers = headers
+        self._csv = csv.writer(stream) if output_format == "csv" else None
+        if self._csv:
+            self._csv.writerow(headers)
+            stream.flush()
+
+    def write(self, row):
+        """Writes a single result row."""
+        values = [None if v is None else (v if isinstance(v, (str, int)) else float(v)) for v in row]
+        if self._csv:
+            self._csv.writerow(["" if v is None else v for v in values])
+        else:
+            self.stream.write(json.dumps(dict(zip(self.headers, values))) + "\n")
+        self.stream.flush()
+
+
+def build_parser():
+    """Builds the command-line argument parser."""
+    parser = argparse.ArgumentParser(prog="3PB-Analyzer", description="Analyzes all the *Data.csv files of a folder.")
+    parser.add_argument("folder", help="The root folder containing one subfolder per sample.")
+    parser.add_argument("--min-window", type=int, default=DEFAULT_MIN_WINDOW_SIZE, help="The minimum linear regression window size.")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW_SIZE, help="The maximum linear regression window size.")
+    parser.add_argument("--preload", type=float, default=DEFAULT_PRELOAD, help="The preload force used to trim the data.")
+    parser.add_argument("--yfc", type=float, default=DEFAULT_Yield_Force_Constant, help="The Yield Force Constant (YFC).")
+    parser.add_argument("--dispc", type=float, default=DEFAULT_Displacement_Constant, help="The Displacement Constant (dispc).")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--engine", choices=WINDOW_ENGINES, default=DEFAULT_WINDOW_ENGINE,
+                        help="The stiffness window search engine.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="The number of worker processes.")
+    parser.add_argument("--plots", choices=PLOT_MODES, default="none", help="Which PNG plots to render (default: none).")
+    parser.add_argument("--plot-workers", type=int, default=DEFAULT_PLOT_WORKERS, help="The number of plot rendering threads.")
+    parser.add_argument("--outlier-threshold", type=float, default=DEFAULT_OUTLIER_THRESHOLD,
+                        help="The modified z-score above which a result is plotted with --plots outliers.")
+    parser.add_argument("--point-budget", type=int, default=DEFAULT_PLOT_POINT_BUDGET,
+                        help="The maximum number of points drawn per plot; longer curves are decimated, 0 draws every point.")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=DEFAULT_USE_CACHE,
+                        help="Reuse the cached results of unchanged files.")
+    parser.add_argument("--store", action=argparse.BooleanOptionalAction, default=DEFAULT_USE_STORE,
+                        help="Record the run in the .sqlite result store next to the folder.")
+    parser.add_argument("--sidecar", action=argparse.BooleanOptionalAction, default=DEFAULT_USE_SIDECAR,
+                        help="Read the data through binary .npy sidecar files.")
+    parser.add_argument("--csv-engine", choices=CSV_ENGINES, default=DEFAULT_CSV_ENGINE,
+                        help="The pandas CSV parser engine (default: pyarrow when it is installed, c otherwise).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="The number of rows parsed at a time in large files.")
+    parser.add_argument("--chunked-min-bytes", type=int, default=CHUNKED_READ_MIN_BYTES,
+                        help="The size in bytes from which a CSV file is read in chunks, keeping only its loading region.")
+    parser.add_argument("--format", choices=STREAM_FORMATS, default="csv", help="The format of the streamed result rows.")
+    parser.add_argument("--result-files", nargs="*", choices=OUTPUT_FORMATS, default=list(DEFAULT_OUTPUT_FORMATS),
+                        help="The formats of the result files written next to the folder (none to skip them).")
+    parser.add_argument("--profile", action=argparse.BooleanOptionalAction, default=DEFAULT_PROFILE,
+                        help="Log per-stage timing percentiles and write a .profile.json trace next to the folder.")
+    parser.add_argument("--profile-memory", action=argparse.BooleanOptionalAction, default=DEFAULT_PROFILE_MEMORY,
+                        help="Also measure the peak memory of each stage when profiling.")
+    parser.add_argument("-o", "--output", default="-", help="The file the result rows are streamed to (default: stdout).")
+    parser.add_argument("--log-level", default="WARNING", help=f"The level of the log messages printed on stderr (the GUI uses {LOG_LEVEL}).")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not report progress on stderr.")
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the analysis from the command line.
+
+    Args:
+        argv (list, optional): The command-line arguments. Defaults to `sys.argv[1:]`.
+
+    Returns:
+        int: The exit code.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    folder = os.path.normpath(args.folder)
+    if not os.path.isdir(folder):
+        parser.error(f"folder not found: {args.folder}")
+    if args.csv_engine == "pyarrow" and importlib.util.find_spec("pyarrow") is None:
+        parser.error("--csv-engine pyarrow requires the pyarrow package")
+
+    from analysis import save_files, HEADERS
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    writer = RowWriter(stream, args.format, HEADERS)
+    failed = []
+    total_files = []
+
+    def on_result(outcome):
+        if outcome["row"]:
+            writer.write(outcome["row"])
+        else:
+            print(f"Failed: {outcome['file']}: {outcome['error']}", file=sys.stderr)
+
+    def on_progress(current_step, max_steps):
+        # save_files reports the analyzed files first, then the Excel rows over twice as many steps.
+        if not total_files:
+            total_files.append(max_steps)
+        if not args.quiet and max_steps == total_files[0]:
+            print(f"Analyzed {current_step}/{max_steps} files", file=sys.stderr)
+
+    try:
+        save_files(folder, on_progress, lambda: None, args.min_window, args.max_window, failed.extend, preload=args.preload,
+                   YFC=args.yfc, disp_c=args.dispc, engine=args.engine, workers=args.workers, plot_mode=args.plots,
+                   plot_workers=args.plot_workers, use_cache=args.cache, use_store=args.store, sidecar=args.sidecar,
+                   x_column=args.x_column, y_column=args.y_column, result_callback=on_result, output_formats=tuple(args.result_files),
+                   profile=args.profile, profile_memory=args.profile_memory, outlier_threshold=args.outlier_threshold,
+                   point_budget=args.point_budget, csv_engine=args.csv_engine, chunk_rows=args.chunk_rows,
+                   chunked_min_bytes=args.chunked_min_bytes)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if failed:
+        print(f"{len(failed)} file(s) failed: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,423 @@
+"""
+Cohort analysis module, used to analyze thousands of short curves at once.
+
+With short curves, most of the time of `analyse_data` goes into the Python calls and small arrays of each file
+rather than into the computations. Here, the curves of a whole cohort are concatenated into one X and one Y array,
+with an offsets array marking where each curve starts: curve `i` is `x[offsets[i]:offsets[i + 1]]` (a ragged, or
+CSR, layout). Every stage of `analysis.py` (trimming, peak, stiffness window search, yield point, fracture and work)
+then runs as a few array operations over all the curves, and the results form a structured array with one record
+per curve. They are those of `analyse_data` on each file, up to rounding error.
+
+The window search computes the sliding sums of each window size from the previous size, so it costs
+`max_window_size` passes over the cohort rather than one per window size.
+
+Usage:
+    python -m cohort <folder> -o results.csv
+"""
+
+import os
+import sys
+import logging
+import argparse
+
+import numpy as np
+
+from ingest import read_xy
+from analysis import HEADERS, find_data_files, r2_from_sums, _TIE_TOLERANCE, _R2_EPSILON
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_USE_SIDECAR)
+
+COHORT_DTYPE = np.dtype([(HEADERS[0], object), *((header, np.float64) for header in HEADERS[1:]), ("Error", object)])
+"""The fields of the cohort results: the `HEADERS` columns, NaN for failed curves, and the error message (None on success)."""
+
+
+def _reduce(ufunc, values, offsets, identity):
+    """Reduces the values of each curve with `ufunc`, giving `identity` for empty curves."""
+    lengths = np.diff(offsets)
+    out = np.full(len(lengths), identity, dtype=np.result_type(values, np.asarray(identity)))
+    nonempty = lengths > 0
+    if nonempty.any():
+        out[nonempty] = ufunc.reduceat(values, offsets[:-1][nonempty])
+    return out
+
+
+def _first(mask, offsets):
+    """Returns the index of the first True value of each curve, -1 if there is none."""
+    n = len(mask)
+    first = _reduce(np.minimum, np.where(mask, np.arange(n), n), offsets, n)
+    return np.where(first < n, first, -1)
+
+
+def _last(mask, offsets):
+    """Returns the index of the last True value of each curve, -1 if there is none."""
+    return _reduce(np.maximum, np.where(mask, np.arange(len(mask)), -1), offsets, -1)
+
+
+def _gather(starts, lengths):
+    """
+    Returns the indices of the ranges `starts[i]` to `starts[i] + lengths[i]`, concatenated, and the offsets of the
+    ranges in the result.
+    """
+    offsets = np.zeros(len(lengths) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+    return np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1]), offsets
+
+
+def to_ragged(curves):
+    """
+    Concatenates curves into the ragged layout.
+
+    Args:
+        curves (iterable): The (X, Y) data of each curve.
+
+    Returns:
+        tuple: The concatenated X and Y data, and the offsets of the curves.
+    """
+    curves = [(np.asarray(x, dtype=float), np.asarray(y, dtype=float)) for x, y in curves]
+    lengths = [len(y) for _, y in curves]
+    offsets = np.zeros(len(curves) + 1, dtype=np.intp)
+    np.cumsum(lengths, out=offsets[1:])
+    if not curves:
+        return np.empty(0), np.empty(0), offsets
+    return np.concatenate([x for x, _ in curves]), np.concatenate([y for _, y in curves]), offsets
+
+
+def trim_cohort(x, y, offsets, preload=DEFAULT_PRELOAD):
+    """
+    Trims every curve to its loading region, as `trim_curve` does.
+
+    Args:
+        x (numpy.ndarray): The concatenated X-axis data.
+        y (numpy.ndarray): The concatenated Y-axis data.
+        offsets (numpy.ndarray): The offsets of the curves.
+        preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+
+    Returns:
+        tuple: The concatenated trimmed X and Y data, their offsets, and a boolean array of the curves that have
+        no force at all (empty or only NaN), which `trim_curve` rejects.
+    """
+    n = len(y)
+    curve = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    index = np.arange(n)
+    ends = offsets[1:]
+
+    # The first occurrence of the peak, NaN forces being skipped.
+    valid = ~np.isnan(y)
+    peak = _reduce(np.maximum, np.where(valid, y, -np.inf), offsets, -np.inf)
+    max_index = _first(valid & (y == peak[curve]), offsets)
+    no_force = max_index < 0
+    max_index = np.where(no_force, offsets[:-1], max_index)
+
+    # The first occurrence of the highest force <= 0 before the peak, the start of the curve if there is none.
+    before = (index < max_index[curve]) & (y <= 0)
+    pre_value = _reduce(np.maximum, np.where(before, y, -np.inf), offsets, -np.inf)
+    pre_index = _first(before & (y == pre_value[curve]), offsets)
+    pre_index = np.where(pre_index < 0, offsets[:-1], pre_index)
+
+    reached = y >= preload
+    first_index = _first(reached & (index >= pre_index[curve]), offsets)
+
+    # The sample before the first non-decreasing step after the peak, the last sample being excluded.
+    rising = np.zeros(n, dtype=bool)
+    rising[:-1] = y[1:] >= y[:-1]
+    rising &= (index >= max_index[curve]) & (index < ends[curve] - 2)
+    last_index = _first(rising, offsets)
+    last_index = np.where(last_index >= 0, last_index, _last(reached, offsets))
+
+    lengths = np.where((first_index >= 0) & ~no_force, np.maximum(last_index + 1 - first_index, 0), 0)
+    take, trimmed_offsets = _gather(first_index, lengths)
+    return x[take], y[take], trimmed_offsets, no_force
+
+
+def _search_windows(x, y, offsets, usable, min_window_size, max_window_size):
+    """
+    Searches the best linear window of every curve, as the vectorized engine of `find_best_window` does.
+
+    All the windows within `_TIE_TOLERANCE` of the best R² of their curve are refitted directly, and the first
+    maximum in (window size, start offset) order wins, with the same `_R2_EPSILON` margin.
+
+    Returns:
+        tuple: The slope, intercept, start index and end index (in the concatenated data) of the best window of
+        each curve; the indices are -1 for curves without any window.
+    """
+    count = len(offsets) - 1
+    lengths = np.diff(offsets)
+    n = len(y)
+    curve = np.repeat(np.arange(count), lengths)
+    local = np.arange(n) - offsets[:-1][curve]
+
+    # Centering each curve keeps the sums small. Unusable curves are zeroed, so they cannot produce NaN.
+    keep = usable[curve]
+    x_mean = _reduce(np.add, np.where(keep, x, 0.0), offsets, 0.0) / np.maximum(lengths, 1)
+    y_mean = _reduce(np.add, np.where(keep, y, 0.0), offsets, 0.0) / np.maximum(lengths, 1)
+    xc = np.where(keep, x - x_mean[curve], 0.0)
+    yc = np.where(keep, y - y_mean[curve], 0.0)
+    values = [xc, yc, xc * xc, yc * yc, xc * yc]
+
+    # The sums of the windows of each size starting at each index, grown by one sample per size.
+    sizes = range(max(min_window_size, 1), max_window_size + 1)
+    sums = [np.zeros(n) for _ in values]
+    r2_by_size = []
+    best = np.full(count, -np.inf)
+    for size in range(1, min(max_window_size, n) + 1):
+        for total, value in zip(sums, values):
+            total[:n - size + 1] += value[size - 1:]
+        if size not in sizes:
+            continue
+        fits = keep & (local + size <= lengths[curve])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r2 = np.where(fits, r2_from_sums(*sums, size), -np.inf)
+        best = np.maximum(best, _reduce(np.maximum, r2, offsets, -np.inf))
+        r2_by_size.append((size, r2))
+
+    # The candidates, by curve, then window size, then start offset.
+    candidate_starts = []
+    candidate_sizes = []
+    for size, r2 in r2_by_size:
+        starts = np.flatnonzero((r2 >= best[curve] - _TIE_TOLERANCE) & (r2 > -np.inf))
+        candidate_starts.append(starts)
+        candidate_sizes.append(np.full(len(starts), size, dtype=np.intp))
+    a = np.zeros(count)
+    b = np.zeros(count)
+    best_start = np.full(count, -1, dtype=np.intp)
+    if not candidate_starts or not sum(len(starts) for starts in candidate_starts):
+        return a, b, best_start, best_start.copy()
+    starts = np.concatenate(candidate_starts)
+    window_sizes = np.concatenate(candidate_sizes)
+    order = np.argsort(curve[starts], kind="stable")
+    starts, window_sizes = starts[order], window_sizes[order]
+    candidate_curve = curve[starts]
+
+    # Refits every candidate from its samples, as `fit_line` does.
+    take, window_offsets = _gather(starts, window_sizes)
+    window = np.repeat(np.arange(len(starts)), window_sizes)
+    xw, yw = x[take], y[take]
+    mean_x = _reduce(np.add, xw, window_offsets, 0.0) / window_sizes
+    mean_y = _reduce(np.add, yw, window_offsets, 0.0) / window_sizes
+    dx = xw - mean_x[window]
+    dy = yw - mean_y[window]
+    sxx = _reduce(np.add, dx * dx, window_offsets, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(sxx > 0, _reduce(np.add, dx * dy, window_offsets, 0.0) / sxx, 0.0)
+    intercept = mean_y - slope * mean_x
+    residuals = yw - (slope[window] * xw + intercept[window])
+    ss_res = _reduce(np.add, residuals * residuals, window_offsets, 0.0)
+    ss_tot = _reduce(np.add, dy * dy, window_offsets, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fit_r2 = np.where(ss_tot == 0, np.where(ss_res == 0, 1.0, 0.0), 1.0 - ss_res / ss_tot)
+
+    # A candidate replaces the best one of its curve only if it beats it by more than `_R2_EPSILON`, in order. The
+    # candidates are taken by rank within their curve, so each step handles at most one candidate per curve.
+    first_candidate = np.searchsorted(candidate_curve, np.arange(count))
+    rank = np.arange(len(starts)) - first_candidate[candidate_curve]
+    by_rank = np.argsort(rank, kind="stable")
+    rank_offsets = np.searchsorted(rank[by_rank], np.arange(rank.max() + 2))
+    best_r2 = np.full(count, -1.0)
+    best_candidate = np.full(count, -1, dtype=np.intp)
+    for k in range(len(rank_offsets) - 1):
+        candidates = by_rank[rank_offsets[k]:rank_offsets[k + 1]]
+        owners = candidate_curve[candidates]
+        better = fit_r2[candidates] > best_r2[owners] + _R2_EPSILON
+        best_r2[owners[better]] = fit_r2[candidates[better]]
+        best_candidate[owners[better]] = candidates[better]
+
+    found = best_candidate >= 0
+    chosen = best_candidate[found]
+    a[found] = slope[chosen]
+    b[found] = intercept[chosen]
+    best_start[found] = starts[chosen]
+    best_end = np.full(count, -1, dtype=np.intp)
+    best_end[found] = starts[chosen] + window_sizes[chosen]
+    return a, b, best_start, best_end
+
+
+def analyse_ragged(x, y, offsets, names=None, min_window_size=DEFAULT_MIN_WINDOW_SIZE, max_window_size=DEFAULT_MAX_WINDOW_SIZE,
+                   preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant, dispc=DEFAULT_Displacement_Constant):
+    """
+    Analyzes every curve of a cohort in the ragged layout.
+
+    Args:
+        x (numpy.ndarray): The concatenated X-axis data of the whole curves.
+        y (numpy.ndarray): The concatenated Y-axis data of the whole curves.
+        offsets (numpy.ndarray): The offsets of the curves, from 0 to `len(y)`.
+        names (list, optional): The name of each curve, stored in the "File Name" field. Defaults to None.
+        min_window_size (int, optional): The minimum size of the linear regression window. Defaults to `DEFAULT_MIN_WINDOW_SIZE`.
+        max_window_size (int, optional): The maximum size of the linear regression window. Defaults to `DEFAULT_MAX_WINDOW_SIZE`.
+        preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+        YFC (float, optional): The Yield Force Constant. Defaults to `DEFAULT_Yield_Force_Constant`.
+        dispc (float, optional): The Displacement Constant. Defaults to `DEFAULT_Displacement_Constant`.
+
+    Returns:
+        numpy.ndarray: One `COHORT_DTYPE` record per curve. Failed curves have NaN results and an error message.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.intp)
+    if len(offsets) < 1 or offsets[0] != 0 or offsets[-1] != len(y) or len(x) != len(y) or (np.diff(offsets) < 0).any():
+        raise ValueError("The offsets must rise from 0 to the length of the data.")
+    count = len(offsets) - 1
+
+    records = np.zeros(count, dtype=COHORT_DTYPE)
+    for header in HEADERS[1:]:
+        records[header] = np.nan
+    records[HEADERS[0]] = names if names is not None else [str(i) for i in range(count)]
+    errors = np.full(count, None, dtype=object)
+
+    def fail(mask, message):
+        errors[mask & np.equal(errors, None)] = message
+
+    x, y, offsets, no_force = trim_cohort(x, y, offsets, preload)
+    lengths = np.diff(offsets)
+    fail(no_force, "The force column is empty or only holds NaN values.")
+    fail(lengths == 0, "No force reaches the preload in the loading region.")
+    nonfinite = _reduce(np.logical_or, ~(np.isfinite(x) & np.isfinite(y)), offsets, False)
+    fail(nonfinite, "Input data contains NaN or infinity.")
+
+    a, b, best_start, best_end = _search_windows(x, y, offsets, np.equal(errors, None), min_window_size, max_window_size)
+    fail(best_end < 0, f"Not enough data points for a window of size {min_window_size}.")
+    ok = np.equal(errors, None)
+    records["Error"] = errors
+    if not ok.any():
+        return records
+
+    # Only the curves still without an error are computed further; their indices are safe to use.
+    curve = np.repeat(np.arange(count), lengths)
+    index = np.arange(len(y))
+    ends = offsets[1:]
+    keep = ok[curve]
+    max_value = _reduce(np.maximum, np.where(keep, y, -np.inf), offsets, -np.inf)
+    max_disp = _reduce(np.maximum, np.where(keep, x, -np.inf), offsets, -np.inf)
+    window_last = np.where(ok, best_end - 1, 0)
+
+    # The yield point, as `find_yield_point` finds it.
+    at_peak = ok & (y[window_last] == max_value)
+    fail(~at_peak & (best_end >= ends), "The fit window ends at the last point, so there is no yield point.")
+    with np.errstate(invalid='ignore', over='ignore'):
+        shifted_expected_y = YFC * a[curve] * (x - max_disp[curve] * dispc) + b[curve]
+        matches = keep & (index >= best_end[curve]) & (0.8 * shifted_expected_y <= y) & (y <= shifted_expected_y)
+    match = _first(matches, offsets)
+    yield_index = np.where(~at_peak & (match >= 0), match, window_last)
+
+    # The fracture, as `find_fracture_index` finds it: the lowest force of at least 0.5 N after the peak.
+    peak_index = _first(keep & (y == max_value[curve]), offsets)
+    after = keep & (index > peak_index[curve]) & (y >= 0.5) & (y < np.inf)
+    lowest = _reduce(np.minimum, np.where(after, y, np.inf), offsets, np.inf)
+    fracture_index = _first(after & (y == lowest[curve]), offsets)
+    fracture_index = np.where(fracture_index >= 0, fracture_index, ends - 1)
+
+    # The work, with the trapezoidal rule up to (excluding) the fracture.
+    ok = np.equal(errors, None)
+    steps = np.where(ok, np.maximum(fracture_index - offsets[:-1] - 1, 0), 0)
+    take, step_offsets = _gather(offsets[:-1], steps)
+    areas = (x[take + 1] - x[take]) * (y[take + 1] + y[take]) / 2.0
+    work = _reduce(np.add, areas, step_offsets, 0.0)
+
+    records["Max Force"][ok] = max_value[ok]
+    records["Stiffness"][ok] = a[ok]
+    records["Yield force"][ok] = y[yield_index[ok]]
+    records["Postyield Displacement"][ok] = x[fracture_index[ok]] - x[yield_index[ok]]
+    records["Work to fracture"][ok] = work[ok]
+    records["Error"] = errors
+    return records
+
+
+def load_cohort(files, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, sidecar=DEFAULT_USE_SIDECAR):
+    """
+    Reads the curves of a list of CSV files into the ragged layout.
+
+    Args:
+        files (list): The paths of the CSV files.
+        sidecar (bool, optional): Whether to read the data through binary sidecar files. Defaults to `DEFAULT_USE_SIDECAR`.
+
+    Returns:
+        tuple: The concatenated X and Y data, the offsets of the curves, and the read error of each file (None if
+        it was read). Files that cannot be read are empty curves.
+    """
+    curves = []
+    errors = []
+    for csv_file in files:
+        try:
+            curves.append(read_xy(csv_file, x_column, y_column, sidecar=sidecar))
+            errors.append(None)
+        except Exception as e:
+            logging.error(f"Error reading file {csv_file}: {e}")
+            curves.append((np.empty(0), np.empty(0)))
+            errors.append(str(e))
+    return (*to_ragged(curves), errors)
+
+
+def analyse_cohort(files, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, min_window_size=DEFAULT_MIN_WINDOW_SIZE,
+                   max_window_size=DEFAULT_MAX_WINDOW_SIZE, preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant,
+                   dispc=DEFAULT_Displacement_Constant, sidecar=DEFAULT_USE_SIDECAR):
+    """
+    Analyzes a list of CSV files as one cohort. This is `analyse_data` on each file, without the per-file overhead.
+
+    Args:
+        files (list): The paths of the CSV files.
+
+    Returns:
+        numpy.ndarray: One `COHORT_DTYPE` record per file, in the order of `files`, named after its folder as in the
+        Excel file.
+    """
+    x, y, offsets, read_errors = load_cohort(files, x_column, y_column, sidecar)
+    names = [os.path.basename(os.path.dirname(csv_file)) for csv_file in files]
+    records = analyse_ragged(x, y, offsets, names, min_window_size, max_window_size, preload, YFC, dispc)
+    for i, error in enumerate(read_errors):
+        if error is not None:
+            records["Error"][i] = error
+    return records
+
+
+def record_rows(records):
+    """Returns the records as result rows with the `HEADERS` columns and the error, with None for missing results."""
+    rows = []
+    for record in records:
+        values = [None if np.isnan(record[header]) else float(record[header]) for header in HEADERS[1:]]
+        rows.append([record[HEADERS[0]], *values, record["Error"]])
+    return rows
+
+
+def main(argv=None):
+    """Runs a cohort analysis from the command line."""
+    parser = argparse.ArgumentParser(description="Analyzes all the *Data.csv files of a folder as one cohort.")
+    parser.add_argument("folder", help="The root folder containing one subfolder per sample.")
+    parser.add_argument("--min-window", type=int, default=DEFAULT_MIN_WINDOW_SIZE, help="The minimum linear regression window size.")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW_SIZE, help="The maximum linear regression window size.")
+    parser.add_argument("--preload", type=float, default=DEFAULT_PRELOAD, help="The preload force used to trim the data.")
+    parser.add_argument("--yfc", type=float, default=DEFAULT_Yield_Force_Constant, help="The Yield Force Constant (YFC).")
+    parser.add_argument("--dispc", type=float, default=DEFAULT_Displacement_Constant, help="The Displacement Constant (dispc).")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--sidecar", action=argparse.BooleanOptionalAction, default=DEFAULT_USE_SIDECAR,
+                        help="Read the data through binary sidecar files.")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="The format of the result rows.")
+    parser.add_argument("-o", "--output", default="-", help="The file the result rows are written to (default: stdout).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level="WARNING", format='%(asctime)s - %(levelname)s - %(message)s')
+
+    folder = os.path.normpath(args.folder)
+    if not os.path.isdir(folder):
+        parser.error(f"folder not found: {args.folder}")
+
+    from cli import RowWriter
+
+    records = analyse_cohort(find_data_files(folder), args.x_column, args.y_column, args.min_window, args.max_window, args.preload,
+                             args.yfc, args.dispc, args.sidecar)
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    try:
+        writer = RowWriter(stream, args.format, HEADERS + ["Error"])
+        for row in record_rows(records):
+            writer.write(row)
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    failed = int(np.not_equal(records["Error"], None).sum())
+    if failed:
+        print(f"{failed} of {len(records)} files failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,10 @@ WINDOW_TITLE = "3PB-Analyzer"
 """The title of the application window."""
 WINDOW_WIDTH = 650
 """The width of the application window."""
-WINDOW_HEIGHT = 400
+WINDOW_HEIGHT = 620
 """The height of the application window."""
+GUI_REFRESH_INTERVAL = 50
+"""The number of milliseconds between two refreshes of the progress and results during an analysis (20 frames per second)."""
 ICON_PATH = "icon.ico"
 """The relative path to the application icon."""
 
@@ -28,6 +30,12 @@ DEFAULT_X_COLUMN = 'Displacement_mm'
 """The default column name for the X-axis data."""
 DEFAULT_Y_COLUMN = 'Force_N'
 """The default column name for the Y-axis data."""
+SET_COLUMN = 'SetName'
+"""The column name of the test set label of each row, used by the grouped analysis."""
+CYCLE_COLUMN = 'Cycle'
+"""The column name of the cycle label of each row (e.g. "1-Preload", "1-Compress"), used by the grouped analysis."""
+PRELOAD_CYCLE_NAMES = ("Preload",)
+"""The names of the preload cycles, without their leading number, which the grouped analysis can drop by label."""
 OUTPUT_IMAGE_DIR = "png"
 """The default directory for output images."""
 
@@ -43,3 +51,85 @@ DEFAULT_PRELOAD = 0
 # Excel cell formats
 Excel_Type = [15, 20, 15, 30, 30, 25]
 """Corresponds to columns A, B, C, D, E, and F in the Excel sheet."""
+
+# Result files
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+"""The available formats of the result files written next to the data folder."""
+DEFAULT_OUTPUT_FORMATS = ("xlsx",)
+"""The default formats of the result files; "parquet" requires pyarrow or fastparquet."""
+
+# Stiffness window search engine
+WINDOW_ENGINES = ("vectorized", "sklearn")
+"""The available stiffness window search engines."""
+DEFAULT_WINDOW_ENGINE = "vectorized"
+"""The default engine for the stiffness window search: "vectorized" (closed-form prefix sums) or "sklearn" (one model per window)."""
+
+# Batch processing
+DEFAULT_WORKERS = os.cpu_count() or 1
+"""The default number of worker processes used to analyze files; 1 analyzes them one at a time in the calling process."""
+
+# Plot rendering
+PLOT_MODES = ("all", "outliers", "none")
+"""The available plot modes: every file, only failed and outlier files, or no plots at all."""
+DEFAULT_PLOT_MODE = "all"
+"""Which plots to render: "all", "outliers" (only failed files and outlier results) or "none"."""
+DEFAULT_PLOT_WORKERS = 2
+"""The default number of background threads rendering the plots."""
+DEFAULT_OUTLIER_THRESHOLD = 3.5
+"""The modified z-score above which a result is considered an outlier."""
+DEFAULT_PLOT_POINT_BUDGET = 5000
+"""The maximum number of points of a curve drawn in its plot; longer curves are decimated, None draws every point."""
+
+# Result cache
+DEFAULT_USE_CACHE = True
+"""Whether to reuse the cached results of files that have not changed since the last run."""
+CACHE_SUFFIX = ".cache.json"
+"""The suffix of the result cache file, stored next to the output Excel file."""
+CACHE_MAX_PARAM_SETS = 4
+"""The number of most recently used parameter sets whose results are kept for each file."""
+
+# Result store
+DEFAULT_USE_STORE = True
+"""Whether to record the results of every run in a SQLite database, from which the Excel file is exported."""
+STORE_SUFFIX = ".sqlite"
+"""The suffix of the result store database, stored next to the output Excel file."""
+STORE_BATCH_SIZE = 500
+"""The number of results inserted in the result store per transaction."""
+
+# Data ingestion
+CSV_ENGINES = ("c", "python", "pyarrow")
+"""The available pandas CSV parser engines."""
+DEFAULT_CSV_ENGINE = None
+"""The pandas CSV parser engine; None picks "pyarrow" when it is installed and "c" otherwise."""
+DEFAULT_USE_SIDECAR = False
+"""Whether to convert each CSV file once into a binary sidecar file that later runs load without parsing."""
+SIDECAR_SUFFIX = ".npy"
+"""The suffix of the sidecar files, which replaces the ".csv" of the data file."""
+CHUNKED_READ_MIN_BYTES = 256 * 1024 * 1024
+"""CSV files at least this large are read a chunk at a time, keeping only their loading region in memory."""
+DEFAULT_CHUNK_ROWS = 1_000_000
+"""The number of rows parsed at a time when a CSV file is read in chunks."""
+
+# Profiling
+DEFAULT_PROFILE = False
+"""Whether to record the time and peak memory of each analysis stage, log percentiles and write a trace file."""
+DEFAULT_PROFILE_MEMORY = True
+"""Whether profiling also measures the peak memory of each stage, which slows down allocation-heavy stages."""
+PROFILE_SUFFIX = ".profile.json"
+"""The suffix of the profiling trace file (Chrome trace format), stored next to the output Excel file."""
+
+# Watch mode
+WATCH_INTERVAL = 2.0
+"""The number of seconds between two scans of the watched data folder."""
+WATCH_SETTLE_SECONDS = 5.0
+"""The number of seconds a new data file's size must stay unchanged before it is considered fully written."""
+
+# Streaming analysis
+STREAM_FRACTURE_DROP = 0.5
+"""The fraction of the maximum force below which a streamed curve is considered fractured, once the force has stopped decreasing after the peak."""
+STREAM_MIN_PEAK_FORCE = 1.0
+"""The maximum force a streamed curve must have reached before a drop counts as a fracture, so preload noise does not."""
+STREAM_FRACTURE_SAMPLES = 5
+"""The number of consecutive samples the force of a streamed curve must stay below the drop, so a noise spike is not taken for the fracture."""
+STREAM_POLL_INTERVAL = 0.5
+"""The number of seconds between two reads of a CSV file that is being written."""
@@ -0,0 +1,73 @@
+"""
+Events module, used to pass the progress and results of an analysis from its worker thread to the GUI.
+
+`save_files` runs in a worker thread and reports through callbacks. The callbacks of an `EventChannel` never touch
+Tk: they only record the events, which the Tk main loop collects with `drain`, polled with `after()`. Progress
+updates are coalesced, so however often the worker reports them, the GUI only sees the latest one per refresh.
+"""
+
+import queue
+import threading
+
+
+class EventChannel:
+    """A thread-safe channel of analysis events, with a cancellation flag."""
+
+    def __init__(self):
+        self._events = queue.SimpleQueue()
+        self._progress = None
+        self._lock = threading.Lock()
+        self.cancel_event = threading.Event()
+
+    # Worker side: these methods are the callbacks passed to `save_files`.
+
+    def progress(self, current_step, max_steps):
+        """Records the progress, replacing any update the GUI has not collected yet."""
+        with self._lock:
+            self._progress = (current_step, max_steps)
+
+    def result(self, outcome):
+        """Queues the result row or error of an analyzed file, from a `process_file` outcome."""
+        self._events.put(("result", (outcome["name"], outcome["row"], outcome["error"])))
+
+    def failed(self, failed_files):
+        """Queues the list of the files whose analysis failed."""
+        self._events.put(("failed", list(failed_files)))
+
+    def complete(self):
+        """Queues the end of the analysis."""
+        self._events.put(("complete", None))
+
+    def error(self, message):
+        """Queues an error that stopped the analysis."""
+        self._events.put(("error", message))
+
+    # GUI side
+
+    def cancel(self):
+        """Asks the analysis to stop after the files being analyzed."""
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """Whether the analysis was asked to stop."""
+        return self.cancel_event.is_set()
+
+    def drain(self):
+        """
+        Collects the events recorded since the last call.
+
+        Returns:
+            tuple: The latest (current step, max steps) progress or None if it has not changed, and the list of
+            (kind, value) events in the order they were recorded.
+        """
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                break
+        # Read after the events, so the progress reported before a "complete" event is never left behind.
+        with self._lock:
+            progress, self._progress = self._progress, None
+        return progress, events
@@ -0,0 +1,204 @@
+"""
+Grouped analysis module, used to analyze the test sets or cycles of a file separately.
+
+The instrument files label each row with its set (`SET_COLUMN`, e.g. "3-Point1") and cycle (`CYCLE_COLUMN`, e.g.
+"1-Preload", "1-Compress"). Instead of treating the whole file as one curve, each file is read once, its rows are
+split into groups with a single stable sort of the group labels, and the groups, now contiguous, are analyzed
+together in one batch, as a cohort of curves (see `cohort.analyse_ragged`), with the same results as `analyse_data`
+on each group. Preload cycles can be dropped by their label rather than by the `preload` force threshold.
+
+The results form a table with one row per file and group.
+
+Usage:
+    python -m grouped <folder> --by cycle --drop-preload -o groups.csv
+"""
+
+import os
+import sys
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ingest import read_labeled_columns
+from analysis import HEADERS, find_data_files
+from cohort import analyse_ragged, record_rows
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_WORKERS, SET_COLUMN, CYCLE_COLUMN,
+                    PRELOAD_CYCLE_NAMES)
+
+GROUP_BY = ("set", "cycle")
+"""The available groupings: by set, or by set and cycle."""
+GROUP_HEADERS = [HEADERS[0], "Set", "Cycle", *HEADERS[1:], "Error"]
+"""The column headers of the grouped rows. The cycle is empty when grouping by set."""
+
+
+def cycle_name(label):
+    """Returns the name of a cycle label without its leading number, e.g. "Preload" for "1-Preload"."""
+    number, _, name = label.partition("-")
+    return name if number.isdigit() and name else label
+
+
+def group_rows(keys):
+    """
+    Splits rows into groups of equal keys, with one stable sort.
+
+    Args:
+        keys (list): One array per key column, e.g. the set and cycle labels of each row.
+
+    Returns:
+        tuple: The row indices sorted by group, in their original order within each group; the offsets of the
+        groups in that order (group `g` is `order[offsets[g]:offsets[g + 1]]`); and the key values of each group.
+        The groups are in the order of their first row.
+    """
+    n = len(keys[0])
+    codes = np.zeros(n, dtype=np.int64)
+    for column in keys:
+        values, inverse = np.unique(column, return_inverse=True)
+        codes = codes * len(values) + inverse.ravel()
+    if not n:
+        return np.zeros(0, dtype=np.intp), np.zeros(1, dtype=np.intp), []
+
+    # Renumber the groups by first appearance, so a single stable sort puts them in file order.
+    group_codes, first_rows, inverse = np.unique(codes, return_index=True, return_inverse=True)
+    rank = np.empty(len(group_codes), dtype=np.intp)
+    rank[np.argsort(first_rows)] = np.arange(len(group_codes))
+    group_of_row = rank[inverse.ravel()]
+    order = np.argsort(group_of_row, kind="stable")
+    offsets = np.zeros(len(group_codes) + 1, dtype=np.intp)
+    offsets[1:] = np.cumsum(np.bincount(group_of_row, minlength=len(group_codes)))
+
+    group_keys = []
+    for g in range(len(group_codes)):
+        row = order[offsets[g]]
+        group_keys.append(tuple(column[row] for column in keys))
+    return order, offsets, group_keys
+
+
+def analyse_groups(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, min_window_size=DEFAULT_MIN_WINDOW_SIZE,
+                   max_window_size=DEFAULT_MAX_WINDOW_SIZE, preload=DEFAULT_PRELOAD, YFC=DEFAULT_Yield_Force_Constant,
+                   dispc=DEFAULT_Displacement_Constant, by="cycle", drop_preload=False):
+    """
+    Analyzes each set or cycle of a single CSV file as its own curve, all the groups in one batch.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        by (str, optional): The grouping, one of `GROUP_BY`. Defaults to "cycle".
+        drop_preload (bool, optional): Whether to drop the rows of the `PRELOAD_CYCLE_NAMES` cycles. Defaults to False.
+
+    Returns:
+        list: One row per group, with the `GROUP_HEADERS` columns. Failed groups have empty results and an error
+        message; a file that cannot be read gives a single failed row.
+    """
+    if by not in GROUP_BY:
+        raise ValueError(f"Unknown grouping '{by}', expected one of {GROUP_BY}.")
+    file_name = os.path.basename(os.path.dirname(csv_file))
+    try:
+        x_raw, y_raw, (sets, cycles) = read_labeled_columns(csv_file, x_column, y_column, (SET_COLUMN, CYCLE_COLUMN))
+    except Exception as e:
+        logging.error(f"Error reading file {csv_file}: {e}")
+        return [[file_name, None, None, None, None, None, None, None, str(e)]]
+
+    if drop_preload:
+        # Classify each distinct label once, rather than each row.
+        labels, inverse = np.unique(cycles, return_inverse=True)
+        preload_labels = np.array([cycle_name(label) in PRELOAD_CYCLE_NAMES for label in labels], dtype=bool)
+        keep = ~preload_labels[inverse.ravel()] if len(labels) else np.ones(0, dtype=bool)
+        x_raw, y_raw, sets, cycles = x_raw[keep], y_raw[keep], sets[keep], cycles[keep]
+
+    order, offsets, group_keys = group_rows([sets, cycles] if by == "cycle" else [sets])
+    records = analyse_ragged(x_raw[order], y_raw[order], offsets, [file_name] * len(group_keys), min_window_size, max_window_size,
+                             preload, YFC, dispc)
+    return [[row[0], key[0], key[1] if by == "cycle" else "", *row[1:]] for key, row in zip(group_keys, record_rows(records))]
+
+
+def run_grouped(files, workers=DEFAULT_WORKERS, progress_callback=None, **kwargs):
+    """
+    Analyzes the groups of a list of CSV files, serially or in a pool of worker processes.
+
+    Args:
+        files (list): The paths of the CSV files.
+        workers (int, optional): The number of worker processes. Defaults to `DEFAULT_WORKERS`.
+        progress_callback (function, optional): Called with (completed files, total files).
+        **kwargs: The `analyse_groups` parameters.
+
+    Yields:
+        list: The rows of each file, in the order of `files`, as soon as they are available.
+    """
+    total_files = len(files)
+
+    if workers is None or workers <= 1 or total_files <= 1:
+        for index, f in enumerate(files):
+            yield analyse_groups(f, **kwargs)
+            if progress_callback:
+                progress_callback(index + 1, total_files)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, total_files), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(analyse_groups, f, **kwargs) for f in files]
+        for index, future in enumerate(futures):
+            yield future.result()
+            if progress_callback:
+                progress_callback(index + 1, total_files)
+
+
+def main(argv=None):
+    """Runs a grouped analysis from the command line."""
+    parser = argparse.ArgumentParser(description="Analyzes each set or cycle of all the *Data.csv files of a folder separately.")
+    parser.add_argument("folder", help="The root folder containing one subfolder per sample.")
+    parser.add_argument("--by", choices=GROUP_BY, default="cycle", help="Group the rows by set, or by set and cycle.")
+    parser.add_argument("--drop-preload", action="store_true",
+                        help=f"Drop the {'/'.join(PRELOAD_CYCLE_NAMES)} cycles by their label.")
+    parser.add_argument("--min-window", type=int, default=DEFAULT_MIN_WINDOW_SIZE, help="The minimum linear regression window size.")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW_SIZE, help="The maximum linear regression window size.")
+    parser.add_argument("--preload", type=float, default=DEFAULT_PRELOAD, help="The preload force used to trim each group.")
+    parser.add_argument("--yfc", type=float, default=DEFAULT_Yield_Force_Constant, help="The Yield Force Constant (YFC).")
+    parser.add_argument("--dispc", type=float, default=DEFAULT_Displacement_Constant, help="The Displacement Constant (dispc).")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="The number of worker processes.")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="The format of the result rows.")
+    parser.add_argument("-o", "--output", default="-", help="The file the result rows are written to (default: stdout).")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not report progress on stderr.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level="WARNING", format='%(asctime)s - %(levelname)s - %(message)s')
+
+    folder = os.path.normpath(args.folder)
+    if not os.path.isdir(folder):
+        parser.error(f"folder not found: {args.folder}")
+
+    from cli import RowWriter
+
+    files = find_data_files(folder)
+    kwargs = dict(x_column=args.x_column, y_column=args.y_column, min_window_size=args.min_window, max_window_size=args.max_window,
+                  preload=args.preload, YFC=args.yfc, dispc=args.dispc, by=args.by, drop_preload=args.drop_preload)
+
+    def on_progress(current_step, max_steps):
+        if not args.quiet:
+            print(f"Analyzed {current_step}/{max_steps} files", file=sys.stderr)
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    failed = 0
+    total = 0
+    try:
+        writer = RowWriter(stream, args.format, GROUP_HEADERS)
+        for rows in run_grouped(files, args.workers, on_progress, **kwargs):
+            for row in rows:
+                writer.write(row)
+                failed += row[-1] is not None
+                total += 1
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if failed:
+        print(f"{failed} of {total} groups failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -3,16 +3,17 @@ Main GUI module, responsible for creating and managing the graphical user interf
 """
 
 import logging
+import multiprocessing
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from threading import Thread
 
-# Import custom modules
-from analysis import save_files  # Import analysis function
+# Import custom modules (analysis is imported by the warm-up thread, after the window is shown)
 from utils import get_resource_path  # Import function to get resource path
+from events import EventChannel  # Import the channel between the analysis thread and the GUI
 from config import (WINDOW_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT,  # Import window title, width, height
                     DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_Yield_Force_Constant,  DEFAULT_Displacement_Constant,
-                    ICON_PATH, LOG_FILE, LOG_LEVEL, DEFAULT_PRELOAD)  # Import icon path, log file, log level
+                    ICON_PATH, LOG_FILE, LOG_LEVEL, DEFAULT_PRELOAD, GUI_REFRESH_INTERVAL)  # Import icon path, log file, log level
 
 # Initialize logging
 logging.basicConfig(filename=get_resource_path(LOG_FILE), level=LOG_LEVEL,
@@ -38,7 +39,10 @@ class AnalysisApp:
         except Exception as e:
             logging.error(f"Error setting icon: {e}")
 
+        self.channel = None  # The event channel of the running analysis, if any
         self._create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(0, self.warm_up)
 
     def _create_widgets(self):
         """Creates GUI widgets"""
@@ -92,14 +96,30 @@ class AnalysisApp:
         self.progress_bar = ttk.Progressbar(self.root, length=425, mode='determinate')
         self.progress_bar.grid(row=6, column=1, columnspan=4, pady=10, sticky="ew")  # shifted content columns + 1
 
-        tk.Button(self.root, text="Generate Excel And Png", command=self.run_analysis).grid(row=7, column=1, columnspan=4,
-                                                                                            pady=5)  # shifted content columns + 1
+        self.run_button = tk.Button(self.root, text="Generate Excel And Png", command=self.run_analysis)
+        self.run_button.grid(row=7, column=1, columnspan=2, pady=5)  # shifted content columns + 1
+        self.cancel_button = tk.Button(self.root, text="Cancel", command=self.cancel_analysis, state=tk.DISABLED)
+        self.cancel_button.grid(row=7, column=3, columnspan=2, pady=5)  # shifted content columns + 1
 
         self.failed_files_text = tk.Text(self.root, height=5, width=60)
         self.failed_files_text.grid(row=8, column=1, columnspan=4, pady=10, sticky="ew")  # shifted content columns + 1
 
+        # Live results table, its columns are set when the first analysis starts
+        self.results_table = ttk.Treeview(self.root, show="headings", height=8)
+        self.results_table.grid(row=9, column=1, columnspan=4, pady=(0, 10), sticky="ew")  # shifted content columns + 1
+        self.results_table.tag_configure("failed", foreground="red")
+
+    def warm_up(self):
+        """Imports the analysis modules and their heavy dependencies in a background thread"""
+        Thread(target=_warm_up, daemon=True).start()
+
     def run_analysis(self):
         """Starts the analysis thread"""
+        from analysis import save_files, HEADERS  # Waits for the warm-up thread if it is still importing
+
+        if self.channel is not None:
+            return
+
         directory = self.folder_label.cget("text")
         min_window_size = int(self.min_window_entry.get())
         max_window_size = int(self.max_window_entry.get())
@@ -108,21 +128,89 @@ class AnalysisApp:
         dispc = float(self.displacement_Constant.get())
         self.progress_bar["value"] = 0
         self.failed_files_text.delete(1.0, tk.END)
-        Thread(target=save_files,
-               args=(directory, self.update_progress, self.show_completion_message,
-                     min_window_size, max_window_size, self.update_failed_files, preload, yfc, dispc)).start()
+        self._reset_results_table(HEADERS)
+
+        # The analysis thread only talks to the GUI through the channel, which is polled from the Tk main loop
+        self.channel = EventChannel()
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        Thread(target=_run_save_files, args=(save_files, self.channel, directory, min_window_size, max_window_size, preload, yfc,
+                                             dispc)).start()
+        self.root.after(GUI_REFRESH_INTERVAL, self._poll_events)
         logging.info(f"Analysis started with min_window_size: {min_window_size}, max_window_size: {max_window_size}, preload: {preload}, yield_force_constant: {yfc}, displacement_constant: {dispc}")
 
+    def cancel_analysis(self):
+        """Stops the running analysis after the files being analyzed, keeping the results so far"""
+        if self.channel is not None:
+            self.channel.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            logging.info("Analysis cancelled by the user.")
+
+    def on_close(self):
+        """Cancels the running analysis, whose partial results are still saved, and closes the window"""
+        if self.channel is not None:
+            self.channel.cancel()
+        self.root.destroy()
+
+    def _poll_events(self):
+        """Applies the events of the analysis thread, once per refresh interval until the analysis is complete"""
+        channel = self.channel
+        progress, events = channel.drain()
+        if progress:
+            self.update_progress(*progress)
+        finished = False
+        error = None
+        for kind, value in events:
+            if kind == "result":
+                self.add_result(*value)
+            elif kind == "failed":
+                self.update_failed_files(value)
+            elif kind == "complete":
+                finished = True
+            elif kind == "error":
+                finished = True
+                error = value
+        if not finished:
+            self.root.after(GUI_REFRESH_INTERVAL, self._poll_events)
+            return
+        self.channel = None
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if error is not None:
+            messagebox.showerror("Error", f"The analysis failed: {error}")
+        else:
+            self.show_completion_message(channel.cancelled)
+
     def update_progress(self, current_step, max_steps):
         """Updates the progress bar"""
         self.progress_bar["value"] = current_step
         self.progress_bar["maximum"] = max_steps
-        self.root.update_idletasks()
 
-    def show_completion_message(self):
+    def show_completion_message(self, cancelled=False):
         """Displays the completion message"""
-        messagebox.showinfo("Finish", "File has been generated!")
-        logging.info("Analysis completed.")
+        if cancelled:
+            messagebox.showinfo("Cancelled", "Analysis cancelled, the files analyzed so far have been generated.")
+            logging.info("Analysis cancelled, partial results saved.")
+        else:
+            messagebox.showinfo("Finish", "File has been generated!")
+            logging.info("Analysis completed.")
+
+    def _reset_results_table(self, headers):
+        """Clears the results table and sets its columns"""
+        self.results_table.delete(*self.results_table.get_children())
+        self.results_table["columns"] = headers
+        for header in headers:
+            self.results_table.heading(header, text=header)
+            self.results_table.column(header, width=WINDOW_WIDTH // len(headers), anchor=tk.CENTER)
+
+    def add_result(self, file_name, row, error):
+        """Adds the result row of a file to the results table, or its error if it failed"""
+        if row:
+            values = [file_name] + [f"{v:.4f}" if isinstance(v, (int, float)) else "" if v is None else v for v in row[1:]]
+            item = self.results_table.insert("", tk.END, values=values)
+        else:
+            item = self.results_table.insert("", tk.END, values=[file_name, f"Failed: {error}"], tags=("failed",))
+        self.results_table.see(item)
 
     def select_directory(self):
         """Selects a directory"""
@@ -139,6 +227,25 @@ class AnalysisApp:
                 self.failed_files_text.insert(tk.END, f"- {file_name}\n")
 
 
+def _run_save_files(save_files, channel, directory, min_window_size, max_window_size, preload, yfc, dispc):
+    """Runs `save_files` in the analysis thread, reporting to the GUI only through the event channel"""
+    try:
+        save_files(directory, channel.progress, channel.complete, min_window_size, max_window_size, channel.failed,
+                   preload, yfc, dispc, result_callback=channel.result, cancel_event=channel.cancel_event)
+    except Exception as e:
+        logging.error(f"Error running the analysis: {e}")
+        channel.error(str(e))
+
+
+def _warm_up():
+    """Imports the analysis modules, so the first analysis does not wait for them"""
+    try:
+        import analysis
+        analysis.warm_up()
+    except Exception as e:
+        logging.error(f"Error importing the analysis modules: {e}")
+
+
 def main():
     """Main function, creates and runs the GUI"""
     root = tk.Tk()
@@ -148,4 +255,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Required for the worker processes of the frozen executable
     main()
@@ -5,7 +5,7 @@ from PyInstaller.utils.hooks import collect_data_files
 added_files = collect_data_files('tkinter')
 
 a = Analysis(
-    ['gui.py', 'analysis.py', 'config.py', 'utils.py'],
+    ['gui.py', 'events.py', 'analysis.py', 'plotting.py', 'cache.py', 'store.py', 'ingest.py', 'chunked.py', 'output.py', 'profiling.py', 'config.py', 'utils.py'],
     pathex=['.'],
     binaries=[],
     datas=[('3PB.log', '.')],  # 删除图标
@@ -13,7 +13,9 @@ a = Analysis(
     hookspath=['.'],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['sklearn', 'scipy', 'joblib', 'threadpoolctl',  # Only used by the optional "sklearn" window engine
+              'matplotlib.pyplot', 'matplotlib.backends.backend_tkagg', 'matplotlib.backends.backend_qtagg',
+              'PyQt5', 'PyQt6', 'PySide2', 'PySide6', 'IPython', 'pytest'],
     noarchive=False,
     optimize=0,
 )
@@ -0,0 +1,208 @@
+"""
+Ingestion module, responsible for reading the force-displacement data of the CSV files.
+
+Only the X and Y columns are parsed, directly as float arrays. Each CSV file can optionally be converted once
+into a binary sidecar file (a `.npy` structured array next to the CSV), which later runs memory-map instead of
+parsing the CSV again. Very large files can also be parsed a chunk of rows at a time (see `iter_csv_chunks`).
+
+pandas is only imported when a CSV file is parsed.
+"""
+
+import os
+import logging
+import importlib.util
+import numpy as np
+
+from config import (DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_CSV_ENGINE, SIDECAR_SUFFIX, DEFAULT_CHUNK_ROWS, SET_COLUMN,
+                    CYCLE_COLUMN)
+
+_BYTES_PER_ROW = 64
+"""A generous estimate of the size of a CSV row, used to turn a number of rows into a pyarrow block size."""
+
+
+def csv_engine():
+    """
+    Returns the fastest available pandas CSV parser engine.
+
+    Returns:
+        str: `DEFAULT_CSV_ENGINE` if set, otherwise "pyarrow" when pyarrow is installed and "c" when it is not.
+    """
+    if DEFAULT_CSV_ENGINE:
+        return DEFAULT_CSV_ENGINE
+    return "pyarrow" if importlib.util.find_spec("pyarrow") is not None else "c"
+
+
+def sidecar_path(csv_file):
+    """Returns the path of the sidecar file of a CSV file, e.g. "A023Data.npy" for "A023Data.csv"."""
+    return os.path.splitext(csv_file)[0] + SIDECAR_SUFFIX
+
+
+def _check_columns(csv_file, columns, error):
+    """Raises a clearer error than the parser's `error` if one of the columns is missing from the CSV file."""
+    import pandas as pd
+
+    header = pd.read_csv(csv_file, nrows=0).columns
+    missing = [column for column in columns if column not in header]
+    if missing:
+        raise ValueError(f"Column {' or '.join(repr(column) for column in missing)} not found in the CSV file.") from error
+
+
+def read_csv_columns(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, engine=None):
+    """
+    Parses the X and Y columns of a CSV file.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        engine (str, optional): The pandas parser engine. Defaults to `csv_engine()`.
+
+    Returns:
+        tuple: The X and Y data as float arrays.
+    """
+    import pandas as pd
+
+    columns = [x_column, y_column]
+    try:
+        df = pd.read_csv(csv_file, usecols=columns, dtype={column: np.float64 for column in columns}, engine=engine or csv_engine())
+    except ValueError as e:
+        _check_columns(csv_file, columns, e)
+        raise
+    return df[x_column].to_numpy(), df[y_column].to_numpy()
+
+
+def read_labeled_columns(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, label_columns=(SET_COLUMN, CYCLE_COLUMN),
+                         engine=None):
+    """
+    Parses the X and Y columns of a CSV file, and the text columns that label each row (e.g. its set and cycle).
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        label_columns (tuple, optional): The names of the label columns. Defaults to (`SET_COLUMN`, `CYCLE_COLUMN`).
+        engine (str, optional): The pandas parser engine. Defaults to `csv_engine()`.
+
+    Returns:
+        tuple: The X and Y data as float arrays, and a list with the labels of each label column as string arrays
+        (empty cells are empty strings).
+    """
+    import pandas as pd
+
+    columns = [x_column, y_column, *label_columns]
+    dtypes = {x_column: np.float64, y_column: np.float64, **{column: str for column in label_columns}}
+    try:
+        df = pd.read_csv(csv_file, usecols=columns, dtype=dtypes, engine=engine or csv_engine())
+    except ValueError as e:
+        _check_columns(csv_file, columns, e)
+        raise
+    return df[x_column].to_numpy(), df[y_column].to_numpy(), [df[column].fillna("").to_numpy(dtype=str) for column in label_columns]
+
+
+def iter_csv_chunks(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, chunk_rows=DEFAULT_CHUNK_ROWS, engine=None):
+    """
+    Parses the X and Y columns of a CSV file a chunk of rows at a time, so only one chunk is in memory.
+
+    The values are parsed by the same parser as `read_csv_columns`: pyarrow's streaming reader when the engine is
+    "pyarrow" (its chunks hold about `chunk_rows` rows), pandas' chunked reader otherwise.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        chunk_rows (int, optional): The number of rows per chunk. Defaults to `DEFAULT_CHUNK_ROWS`.
+        engine (str, optional): The parser engine. Defaults to `csv_engine()`.
+
+    Yields:
+        tuple: The X and Y data of each chunk as float arrays.
+    """
+    columns = [x_column, y_column]
+    if (engine or csv_engine()) == "pyarrow":
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+
+        try:
+            reader = pa_csv.open_csv(csv_file, read_options=pa_csv.ReadOptions(block_size=chunk_rows * _BYTES_PER_ROW),
+                                     convert_options=pa_csv.ConvertOptions(include_columns=columns,
+                                                                            column_types={column: pa.float64() for column in columns}))
+        except ValueError as e:
+            _check_columns(csv_file, columns, e)
+            raise
+        for batch in reader:
+            yield (batch.column(x_column).to_numpy(zero_copy_only=False).astype(np.float64, copy=False),
+                   batch.column(y_column).to_numpy(zero_copy_only=False).astype(np.float64, copy=False))
+        return
+
+    import pandas as pd
+
+    try:
+        reader = pd.read_csv(csv_file, usecols=columns, dtype={column: np.float64 for column in columns}, chunksize=chunk_rows,
+                             engine=engine or "c")
+    except ValueError as e:
+        _check_columns(csv_file, columns, e)
+        raise
+    with reader:
+        for chunk in reader:
+            yield chunk[x_column].to_numpy(), chunk[y_column].to_numpy()
+
+
+def write_sidecar(csv_file, x_data, y_data, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN):
+    """
+    Saves the X and Y data of a CSV file to its sidecar file.
+
+    The data is stored as a structured array whose field names are the column names.
+    """
+    data = np.empty(len(x_data), dtype=[(x_column, np.float64), (y_column, np.float64)])
+    data[x_column] = x_data
+    data[y_column] = y_data
+    path = sidecar_path(csv_file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, data)
+    os.replace(tmp_path, path)
+
+
+def load_sidecar(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN):
+    """
+    Memory-maps the sidecar file of a CSV file.
+
+    Returns:
+        tuple or None: The X and Y data, or None if the sidecar file is missing, older than the CSV file or
+        does not hold both columns.
+    """
+    path = sidecar_path(csv_file)
+    try:
+        if os.stat(path).st_mtime_ns < os.stat(csv_file).st_mtime_ns:
+            return None
+        data = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if data.dtype.names is None or x_column not in data.dtype.names or y_column not in data.dtype.names:
+        return None
+    return data[x_column], data[y_column]
+
+
+def read_xy(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, sidecar=False, engine=None):
+    """
+    Reads the X and Y data of a CSV file.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        sidecar (bool, optional): Whether to load the data from the sidecar file, creating it if it is missing or
+            out of date. Defaults to False.
+        engine (str, optional): The pandas parser engine. Defaults to `csv_engine()`.
+
+    Returns:
+        tuple: The X and Y data as float arrays.
+    """
+    if sidecar:
+        loaded = load_sidecar(csv_file, x_column, y_column)
+        if loaded is not None:
+            return loaded
+    x_data, y_data = read_csv_columns(csv_file, x_column, y_column, engine)
+    if sidecar:
+        try:
+            write_sidecar(csv_file, x_data, y_data, x_column, y_column)
+        except Exception as e:
+            logging.error(f"Error writing sidecar file for {csv_file}: {e}")
+    return x_data, y_data
@@ -0,0 +1,162 @@
+"""
+Output module, responsible for writing the result rows to the Excel file and the machine-readable formats.
+
+The Excel file is written in openpyxl's write-only (streaming) mode: rows are appended one at a time with shared
+named styles, instead of building the whole sheet in memory and styling every cell afterwards. openpyxl is only
+imported when an Excel file is written.
+"""
+
+import re
+import csv
+import logging
+
+from config import Excel_Type, OUTPUT_FORMATS
+
+TEXT_STYLE = "3PB Text"
+"""The named style of the header row and the file name column: centered, with thin borders."""
+NUMBER_STYLE = "3PB Number"
+"""The named style of the result values: centered, with thin borders and four decimals."""
+GROUP_GAP = 2
+"""The number of blank rows between two groups of files."""
+_FORMAT_NAMES = {"xlsx": "Excel", "csv": "CSV", "parquet": "Parquet"}
+
+
+def group_prefix(file_name):
+    """Returns the leading letters of a file name, used to group the rows (e.g. "A" for "A023")."""
+    match = re.match(r"([A-Za-z]+)", file_name)
+    return match.group(1) if match else ''
+
+
+def grouped_rows(rows):
+    """
+    Inserts blank rows between the groups of result rows.
+
+    Args:
+        rows (list): The result rows, starting with the file name.
+
+    Yields:
+        list: The rows, with `GROUP_GAP` empty lists wherever the group prefix changes.
+    """
+    last_first_char = None
+    for entry in rows:
+        current_first_char = group_prefix(entry[0])
+        if last_first_char is not None and current_first_char != last_first_char:
+            for _ in range(GROUP_GAP):
+                yield []
+        yield entry
+        last_first_char = current_first_char
+
+
+def _named_styles():
+    """Creates the named styles of the Excel sheet."""
+    from openpyxl.styles import Alignment, Border, Side, NamedStyle
+
+    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                         top=Side(style='thin'), bottom=Side(style='thin'))
+    alignment = Alignment(horizontal='center', vertical='center')
+    text = NamedStyle(name=TEXT_STYLE, alignment=alignment, border=thin_border)
+    number = NamedStyle(name=NUMBER_STYLE, alignment=alignment, border=thin_border, number_format='0.0000')
+    return text, number
+
+
+def write_excel(rows, excel_file_path, headers, progress_callback=None):
+    """
+    Writes the result rows to an Excel file, grouped by file name prefix.
+
+    Every cell of the table, including the blank rows between groups, is centered and bordered, and the result
+    values use four decimals.
+
+    Args:
+        rows (list): The result rows, starting with the file name.
+        excel_file_path (str): The path to the Excel file.
+        headers (list): The column headers.
+        progress_callback (function, optional): Called with (written rows, total rows) after each result row.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+    ws = wb.create_sheet()
+
+    for index, width in enumerate(Excel_Type):
+        ws.column_dimensions[get_column_letter(index + 1)].width = width
+
+    columns = len(headers)
+
+    def styled_row(values):
+        cells = []
+        for col in range(columns):
+            cell = WriteOnlyCell(ws, value=values[col] if col < len(values) else None)
+            cell.style = TEXT_STYLE if col == 0 else NUMBER_STYLE
+            cells.append(cell)
+        return cells
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.style = TEXT_STYLE
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    written = 0
+    for entry in grouped_rows(rows):
+        ws.append(styled_row(entry))
+        if entry:
+            written += 1
+            if progress_callback:
+                progress_callback(written, len(rows))
+
+    wb.save(excel_file_path)
+
+
+def write_csv(rows, csv_file_path, headers):
+    """Writes the result rows to a CSV file, without the blank rows between groups."""
+    with open(csv_file_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(["" if v is None else v for v in row])
+
+
+def write_parquet(rows, parquet_file_path, headers):
+    """Writes the result rows to a Parquet file. This requires pyarrow or fastparquet."""
+    import pandas as pd
+
+    pd.DataFrame(rows, columns=headers).to_parquet(parquet_file_path, index=False)
+
+
+def write_results(rows, base_path, headers, formats=("xlsx",), progress_callback=None):
+    """
+    Writes the result rows in each of the requested formats.
+
+    Errors are logged, and do not prevent the other formats from being written.
+
+    Args:
+        rows (list): The result rows, starting with the file name.
+        base_path (str): The path of the output files without extension.
+        headers (list): The column headers.
+        formats (tuple, optional): The output formats, each one of `OUTPUT_FORMATS`. Defaults to ("xlsx",).
+        progress_callback (function, optional): Called with (written rows, total rows) while writing the Excel file.
+
+    Returns:
+        list: The paths of the files that were written.
+    """
+    writers = {"xlsx": lambda path: write_excel(rows, path, headers, progress_callback),
+               "csv": lambda path: write_csv(rows, path, headers),
+               "parquet": lambda path: write_parquet(rows, path, headers)}
+    written = []
+    for output_format in formats:
+        if output_format not in OUTPUT_FORMATS:
+            logging.error(f"Unknown output format '{output_format}', expected one of {OUTPUT_FORMATS}")
+            continue
+        path = f"{base_path}.{output_format}"
+        try:
+            writers[output_format](path)
+            written.append(path)
+            logging.info(f"{_FORMAT_NAMES[output_format]} file saved to {path}")
+        except Exception as e:
+            logging.error(f"Error saving {_FORMAT_NAMES[output_format].lower()} file: {e}")
+    return written
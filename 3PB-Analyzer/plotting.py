@@ -0,0 +1,175 @@
+"""
+Plotting module, responsible for rendering the scatter plots in a background pipeline.
+
+The plots are drawn with the object-oriented Figure/Agg API instead of the pyplot state machine, so
+several figures can be rendered at the same time from the pipeline's worker threads.
+
+Long curves are decimated before they are drawn (see `decimate`): only the background scatter of the curve is
+reduced to `DEFAULT_PLOT_POINT_BUDGET` points, the fit window, fit line and yield point are always drawn from the
+full data, and the analysis results are never affected.
+"""
+
+import queue
+import logging
+import threading
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from config import DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_PLOT_WORKERS, DEFAULT_PLOT_POINT_BUDGET
+
+
+def decimate(x_data, y_data, budget=DEFAULT_PLOT_POINT_BUDGET):
+    """
+    Selects the points of a curve to draw, with the Largest-Triangle-Three-Buckets (LTTB) algorithm.
+
+    The first and last points are kept, and the others are split into `budget - 2` buckets of consecutive points.
+    In each bucket, the point forming the largest triangle with the point kept in the previous bucket and the
+    average of the next bucket is kept, which preserves the peaks and the shape of the curve.
+
+    Args:
+        x_data (numpy.ndarray): The X-axis data.
+        y_data (numpy.ndarray): The Y-axis data.
+        budget (int, optional): The maximum number of points; None or 0 keeps every point. Defaults to `DEFAULT_PLOT_POINT_BUDGET`.
+
+    Returns:
+        numpy.ndarray: The increasing indices of the kept points.
+    """
+    n = len(x_data)
+    if not budget or n <= budget or budget < 3:
+        return np.arange(n)
+    x = np.asarray(x_data, dtype=float)
+    y = np.asarray(y_data, dtype=float)
+
+    # Bucket i holds the points [edges[i], edges[i + 1]), between the first and the last point.
+    edges = (np.arange(budget - 1) * ((n - 2) / (budget - 2))).astype(np.intp) + 1
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    # The averages of each bucket, and of the last point as the bucket after the last one.
+    x_avg = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    y_avg = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(budget, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(budget - 2):
+        start, end = edges[i], edges[i + 1]
+        ax, ay = x[previous], y[previous]
+        # Twice the triangle areas, the constant factor does not change the largest one.
+        areas = np.abs((ax - x_avg[i + 1]) * (y[start:end] - ay) - (ax - x[start:end]) * (y_avg[i + 1] - ay))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def create_scatter_plot(title="3point", xlabel=DEFAULT_X_COLUMN, ylabel=DEFAULT_Y_COLUMN, output_image="scatter_plot.png", results_plot=None,
+                        point_budget=DEFAULT_PLOT_POINT_BUDGET):
+    """
+        Creates a scatter plot.
+
+        If `results_plot` only holds the raw data (e.g. for a failed file), only the data points are drawn.
+
+        Args:
+            title (str, optional): The title of the plot. Defaults to "3point".
+            xlabel (str, optional): The label for the X-axis. Defaults to `DEFAULT_X_COLUMN`.
+            ylabel (str, optional): The label for the Y-axis. Defaults to `DEFAULT_Y_COLUMN`.
+            output_image (str, optional): The filename for the output image. Defaults to "scatter_plot.png".
+            point_budget (int, optional): The maximum number of background points, see `decimate`; None draws every
+                point. Defaults to `DEFAULT_PLOT_POINT_BUDGET`.
+
+    """
+    try:
+        x_data = results_plot["x_data"]
+        y_data = results_plot["y_data"]
+
+        fig = Figure(figsize=(8, 6))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        shown = decimate(x_data, y_data, point_budget)
+        ax.scatter(x_data[shown], y_data[shown], label="other")
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        ax.grid(True)
+
+        if "best_start" in results_plot:
+            best_start = results_plot["best_start"]
+            best_end = results_plot["best_end"]
+
+            a = results_plot['a']
+            b = results_plot['b']
+
+            x_fit_window = x_data[best_start:best_end]
+            y_fit_window = y_data[best_start:best_end]
+
+            ax.scatter(x_fit_window, y_fit_window, color='yellow', label="linear")
+            x_fit_line = np.array([x_data.min(), x_data.max()])
+            y_fit_line = a * x_fit_line + b
+            ax.plot(x_fit_line, y_fit_line, color='red', label='linear line')
+
+            ax.scatter(results_plot["yield_force_x"], results_plot["yield_force_y"], color='black', label="YF")
+        ax.legend()
+        fig.savefig(output_image)
+
+    except Exception as e:
+        logging.error(f"Error in create_scatter_plot: {e}")
+        return None
+
+
+class PlotPipeline:
+    """
+    A queue of plot jobs served by a pool of background threads.
+
+    Jobs are plain callables, usually `create_scatter_plot` with its arguments. Errors are logged and never
+    stop the pipeline.
+    """
+
+    def __init__(self, workers=DEFAULT_PLOT_WORKERS):
+        """
+        Starts the worker threads.
+
+        Args:
+            workers (int, optional): The number of rendering threads. Defaults to `DEFAULT_PLOT_WORKERS`.
+        """
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self):
+        """Renders queued jobs until the stop sentinel is received."""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                func, args, kwargs = job
+                func(*args, **kwargs)
+            except Exception as e:
+                logging.error(f"Error in plot pipeline: {e}")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func, *args, **kwargs):
+        """Queues a plot job."""
+        self._queue.put((func, args, kwargs))
+
+    def close(self, wait=True):
+        """
+        Stops the pipeline once every queued job has been rendered.
+
+        Args:
+            wait (bool, optional): Whether to block until the worker threads have finished. Defaults to True.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
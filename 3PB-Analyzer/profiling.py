@@ -0,0 +1,134 @@
+"""
+Profiling module, used to record where the time and memory of a batch go, stage by stage and specimen by specimen.
+
+Profiling is opt-in (see `DEFAULT_PROFILE`). Each specimen's stages are recorded by a `SpecimenProfile`, in the
+worker process that analyzes it, and collected by a `ProfileReport` in the calling process. The report logs
+percentiles per stage and writes a Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev) that also
+holds the raw per-specimen records.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+STAGES = ("read", "trim", "window", "yield", "fracture", "work", "plot", "excel")
+"""The profiled stages, in pipeline order. "excel" is recorded once per batch, the others once per specimen."""
+PERCENTILES = (50, 90, 99)
+"""The percentiles logged for each stage."""
+
+
+class SpecimenProfile:
+    """Records the wall time and peak memory of each stage of a single specimen."""
+
+    def __init__(self, name, trace_memory=True):
+        """
+        Args:
+            name (str): The specimen name.
+            trace_memory (bool, optional): Whether to measure the peak memory of each stage with `tracemalloc`,
+                which slows down allocation-heavy stages. Defaults to True.
+        """
+        self.name = name
+        self.trace_memory = trace_memory
+        self.records = []
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, stage):
+        """
+        Records a stage for the duration of the `with` block.
+
+        The peak memory is the highest amount allocated during the stage, above what was allocated when it
+        started. It is only measured for stages run one at a time, i.e. not for the plot threads.
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            base_memory = tracemalloc.get_traced_memory()[0]
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = tracemalloc.get_traced_memory()[1] - base_memory if self.trace_memory else None
+            self.records.append({"specimen": self.name, "stage": stage, "start": start_time, "seconds": seconds,
+                                 "peak_bytes": peak_bytes, "pid": os.getpid(), "tid": threading.get_ident()})
+
+
+def stage(profile, name):
+    """Returns `profile.stage(name)`, or a no-op context when `profile` is None."""
+    return profile.stage(name) if profile is not None else nullcontext()
+
+
+class ProfileReport:
+    """Collects the stage records of a batch, from any thread."""
+
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, records):
+        """Adds the records of a `SpecimenProfile`."""
+        with self._lock:
+            self.records.extend(records)
+
+    def summary(self):
+        """
+        Aggregates the records per stage.
+
+        Returns:
+            dict: For each recorded stage, the number of records, the total seconds, the `PERCENTILES` and maximum
+            of the seconds and of the peak memory, and the slowest specimen.
+        """
+        summary = {}
+        for name in STAGES:
+            records = [r for r in self.records if r["stage"] == name]
+            if not records:
+                continue
+            seconds = np.array([r["seconds"] for r in records])
+            peaks = np.array([r["peak_bytes"] for r in records if r["peak_bytes"] is not None], dtype=float)
+            summary[name] = {
+                "count": len(records),
+                "total_seconds": float(seconds.sum()),
+                "seconds": dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(seconds, PERCENTILES).tolist()),
+                                max=float(seconds.max())),
+                "peak_bytes": dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(peaks, PERCENTILES).tolist()),
+                                   max=float(peaks.max())) if len(peaks) else None,
+                "slowest": records[int(seconds.argmax())]["specimen"],
+            }
+        return summary
+
+    def log_summary(self):
+        """Logs the per-stage percentiles at INFO level."""
+        for name, s in self.summary().items():
+            seconds = ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in s["seconds"].items())
+            memory = ""
+            if s["peak_bytes"]:
+                memory = "; peak memory " + ", ".join(f"{k} {v / 1024:.0f} KiB" for k, v in s["peak_bytes"].items())
+            logging.info(f"Profile {name}: {s['count']} x, total {s['total_seconds']:.3f} s; {seconds}{memory}; "
+                         f"slowest {s['slowest']}")
+
+    def trace_events(self):
+        """Converts the records to Chrome trace "complete" events, in microseconds since the first record."""
+        if not self.records:
+            return []
+        origin = min(r["start"] for r in self.records)
+        return [{"name": r["stage"], "cat": "3PB", "ph": "X", "ts": (r["start"] - origin) * 1e6, "dur": r["seconds"] * 1e6,
+                 "pid": r["pid"], "tid": r["tid"], "args": {"specimen": r["specimen"], "peak_bytes": r["peak_bytes"]}}
+                for r in self.records]
+
+    def write_trace(self, path):
+        """
+        Writes the records as a Chrome trace JSON file.
+
+        Besides the `traceEvents`, the file holds the raw `records` and the per-stage `summary`.
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms", "records": self.records,
+                       "summary": self.summary()}, f)
@@ -0,0 +1,318 @@
+"""
+Result store module, used to keep the results of every run in a local SQLite database.
+
+The database is stored next to the output Excel file and is never overwritten: each run of `save_files` adds a
+row to the `runs` table and one row per analyzed file to the `results` table, with the analysis parameters
+(`param_sets`), the hash of the data file, the best stiffness window and the analysis time. The Excel file is an
+export of one run (see `ResultStore.run_rows`), and the history of a specimen or group can be queried across runs.
+
+The results are indexed by specimen name, group prefix, run and parameter set, and are inserted in batched
+transactions.
+
+Usage:
+    python -m store ../femur-3PBdata.sqlite --group A --last-runs 10 --value Stiffness
+    python -m store ../femur-3PBdata.sqlite --runs
+"""
+
+import os
+import sys
+import time
+import logging
+import sqlite3
+import argparse
+
+from output import group_prefix
+from config import STORE_BATCH_SIZE
+
+STORE_FORMAT = 1
+"""The version of the database schema, stored in its `user_version`."""
+RESULT_COLUMNS = {"Max Force": "max_force", "Stiffness": "stiffness", "Yield force": "yield_force",
+                  "Postyield Displacement": "postyield_displacement", "Work to fracture": "work_to_fracture"}
+"""The result columns of the database, keyed by their Excel header."""
+PARAMETERS = ("min_window_size", "max_window_size", "preload", "YFC", "dispc", "engine", "x_column", "y_column")
+"""The analysis parameters recorded with each run, named as in `analyse_data`."""
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS param_sets (
+    id INTEGER PRIMARY KEY,
+    min_window_size INTEGER, max_window_size INTEGER, preload REAL, YFC REAL, dispc REAL,
+    engine TEXT, x_column TEXT, y_column TEXT,
+    UNIQUE ({", ".join(PARAMETERS)})
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    param_set INTEGER NOT NULL REFERENCES param_sets(id),
+    analysis_version INTEGER,
+    started REAL NOT NULL,
+    finished REAL,
+    files INTEGER,
+    failed INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run INTEGER NOT NULL REFERENCES runs(id),
+    param_set INTEGER NOT NULL REFERENCES param_sets(id),
+    position INTEGER NOT NULL,
+    specimen TEXT NOT NULL,
+    group_prefix TEXT NOT NULL,
+    file TEXT NOT NULL,
+    file_hash TEXT,
+    {", ".join(f"{column} REAL" for column in RESULT_COLUMNS.values())},
+    best_start INTEGER,
+    best_end INTEGER,
+    seconds REAL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS results_specimen ON results (specimen, run);
+CREATE INDEX IF NOT EXISTS results_group ON results (group_prefix, run);
+CREATE INDEX IF NOT EXISTS results_run ON results (run, position);
+CREATE INDEX IF NOT EXISTS results_param_set ON results (param_set, run);
+CREATE INDEX IF NOT EXISTS results_file_hash ON results (file_hash, param_set);
+"""
+
+
+def _number(value):
+    """Converts a result value to a float for the database, or None if it is missing or not a number."""
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ResultStore:
+    """
+    A SQLite database of the results of every run.
+
+    Results are buffered and inserted `STORE_BATCH_SIZE` at a time, each batch in a single transaction; call
+    `flush` (or `finish_run`, or `close`) to write the rest.
+    """
+
+    def __init__(self, db_path):
+        """
+        Opens the database, creating it if needed.
+
+        Args:
+            db_path (str): The path to the SQLite file.
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        # WAL lets queries read the history while a run is being written, and makes each commit cheaper.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version={STORE_FORMAT}")
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def param_set(self, **params):
+        """
+        Returns the id of a parameter set, adding it if it is new.
+
+        Args:
+            **params: The `PARAMETERS` values; missing ones are stored as NULL.
+        """
+        values = [params.get(name) for name in PARAMETERS]
+        where = " AND ".join(f"{name} IS ?" for name in PARAMETERS)
+        row = self._conn.execute(f"SELECT id FROM param_sets WHERE {where}", values).fetchone()
+        if row:
+            return row[0]
+        with self._conn:
+            cursor = self._conn.execute(f"INSERT INTO param_sets ({', '.join(PARAMETERS)}) VALUES ({', '.join('?' * len(PARAMETERS))})",
+                                        values)
+        return cursor.lastrowid
+
+    def start_run(self, root, analysis_version=None, **params):
+        """
+        Records the start of a run.
+
+        Args:
+            root (str): The analyzed data folder.
+            analysis_version (int, optional): The version of the analysis that produces the results.
+            **params: The analysis parameters, see `param_set`.
+
+        Returns:
+            int: The run id.
+        """
+        param_set = self.param_set(**params)
+        with self._conn:
+            cursor = self._conn.execute("INSERT INTO runs (root, param_set, analysis_version, started) VALUES (?, ?, ?, ?)",
+                                        (os.path.abspath(root), param_set, analysis_version, time.time()))
+        return cursor.lastrowid
+
+    def add(self, run, position, outcome):
+        """
+        Buffers the outcome of a file, and writes the buffer once it holds `STORE_BATCH_SIZE` results.
+
+        Args:
+            run (int): The run id, from `start_run`.
+            position (int): The position of the file in the run, which is the order of the exported rows.
+            outcome (dict): The `process_file` outcome of the file.
+        """
+        row = outcome["row"]
+        values = [_number(v) for v in row[1:]] if row else [None] * len(RESULT_COLUMNS)
+        best_start, best_end = outcome.get("window") or (None, None)
+        self._pending.append((run, run, position, outcome["name"], group_prefix(outcome["name"]), outcome["file"],
+                              outcome.get("hash"), *values, best_start, best_end, outcome.get("seconds"),
+                              int(bool(outcome.get("cached"))), outcome["error"]))
+        if len(self._pending) >= STORE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered results in a single transaction."""
+        if not self._pending:
+            return
+        columns = ["run", "param_set", "position", "specimen", "group_prefix", "file", "file_hash", *RESULT_COLUMNS.values(),
+                   "best_start", "best_end", "seconds", "cached", "error"]
+        placeholders = ", ".join(["?", "(SELECT param_set FROM runs WHERE id = ?)"] + ["?"] * (len(columns) - 2))
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO results ({', '.join(columns)}) VALUES ({placeholders})", self._pending)
+        self._pending = []
+
+    def finish_run(self, run):
+        """Writes the buffered results and records the end of a run, with its numbers of files and failures."""
+        self.flush()
+        with self._conn:
+            self._conn.execute("UPDATE runs SET finished = ?, files = (SELECT COUNT(*) FROM results WHERE run = ?), "
+                               "failed = (SELECT COUNT(*) FROM results WHERE run = ? AND error IS NOT NULL) WHERE id = ?",
+                               (time.time(), run, run, run))
+
+    def previous_result(self, file_hash, param_set):
+        """
+        Finds the latest stored result of a file's content with a parameter set, e.g. for a result reused from the
+        cache.
+
+        Returns:
+            dict or None: The "best_start", "best_end" and "seconds" of that result, or None if there is none.
+        """
+        row = self._conn.execute("SELECT best_start, best_end, seconds FROM results WHERE file_hash = ? AND param_set = ? "
+                                 "AND error IS NULL AND cached = 0 ORDER BY run DESC LIMIT 1", (file_hash, param_set)).fetchone()
+        return dict(zip(("best_start", "best_end", "seconds"), row)) if row else None
+
+    def run_rows(self, run):
+        """
+        Returns the result rows of a run, in the order of the Excel file.
+
+        Returns:
+            list: The file name followed by the results of each successful file.
+        """
+        self.flush()
+        return [list(row) for row in self._conn.execute(
+            f"SELECT specimen, {', '.join(RESULT_COLUMNS.values())} FROM results WHERE run = ? AND error IS NULL ORDER BY position",
+            (run,))]
+
+    def runs(self, root=None, limit=None):
+        """
+        Lists the runs, the latest first.
+
+        Args:
+            root (str, optional): Only list the runs of this data folder.
+            limit (int, optional): The maximum number of runs.
+
+        Returns:
+            list: A dict per run with its id, folder, times, numbers of files and failures, and parameters.
+        """
+        query = (f"SELECT runs.id, root, started, finished, files, failed, {', '.join(PARAMETERS)} FROM runs "
+                 "JOIN param_sets ON param_sets.id = runs.param_set")
+        args = []
+        if root is not None:
+            query += " WHERE root = ?"
+            args.append(os.path.abspath(root))
+        query += " ORDER BY runs.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        names = ("run", "root", "started", "finished", "files", "failed", *PARAMETERS)
+        return [dict(zip(names, row)) for row in self._conn.execute(query, args)]
+
+    def history(self, value="Stiffness", specimen=None, group=None, last_runs=None, param_set=None, root=None):
+        """
+        Queries a result value across runs.
+
+        For example, `history("Stiffness", group="A", last_runs=10)` returns all the A-group stiffness values of the
+        last 10 runs.
+
+        Args:
+            value (str, optional): The Excel header of the result value. Defaults to "Stiffness".
+            specimen (str, optional): Only return the results of this specimen.
+            group (str, optional): Only return the results of this group prefix.
+            last_runs (int, optional): Only return the results of the latest runs.
+            param_set (int, optional): Only return the results of this parameter set.
+            root (str, optional): Only return the results of this data folder.
+
+        Returns:
+            list: (run, specimen, value) tuples, by run then by position in the run.
+        """
+        if value not in RESULT_COLUMNS:
+            raise ValueError(f"Unknown result value '{value}', expected one of {tuple(RESULT_COLUMNS)}.")
+        self.flush()
+        conditions = ["results.error IS NULL"]
+        args = []
+        for column, arg in (("results.specimen", specimen), ("results.group_prefix", group), ("results.param_set", param_set)):
+            if arg is not None:
+                conditions.append(f"{column} = ?")
+                args.append(arg)
+        if root is not None or last_runs is not None:
+            runs = "SELECT id FROM runs"
+            if root is not None:
+                runs += " WHERE root = ?"
+                args.append(os.path.abspath(root))
+            runs += " ORDER BY id DESC"
+            if last_runs is not None:
+                runs += " LIMIT ?"
+                args.append(last_runs)
+            conditions.append(f"results.run IN ({runs})")
+        query = (f"SELECT run, specimen, {RESULT_COLUMNS[value]} FROM results WHERE {' AND '.join(conditions)} "
+                 "ORDER BY run, position")
+        return self._conn.execute(query, args).fetchall()
+
+    def close(self):
+        """Writes the buffered results and closes the database."""
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Error writing results to {self.db_path}: {e}")
+        self._conn.close()
+
+
+def main(argv=None):
+    """Queries a result store from the command line."""
+    parser = argparse.ArgumentParser(description="Queries the results of previous runs stored next to a data folder.")
+    parser.add_argument("database", help="The result store, e.g. femur-3PBdata.sqlite.")
+    parser.add_argument("--runs", action="store_true", help="List the runs instead of the results.")
+    parser.add_argument("--value", choices=tuple(RESULT_COLUMNS), default="Stiffness", help="The result value.")
+    parser.add_argument("--specimen", help="Only the results of this specimen.")
+    parser.add_argument("--group", help="Only the results of this group prefix, e.g. A.")
+    parser.add_argument("--last-runs", type=int, help="Only the results of the latest runs.")
+    parser.add_argument("--param-set", type=int, help="Only the results of this parameter set.")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="The format of the rows.")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.database):
+        parser.error(f"database not found: {args.database}")
+
+    from cli import RowWriter
+
+    with ResultStore(args.database) as store:
+        if args.runs:
+            runs = store.runs(limit=args.last_runs)
+            headers = ["run", "root", "started", "finished", "files", "failed", *PARAMETERS]
+            writer = RowWriter(sys.stdout, args.format, headers)
+            for run in runs:
+                writer.write([run[h] for h in headers])
+        else:
+            writer = RowWriter(sys.stdout, args.format, ["run", "specimen", args.value])
+            for row in store.history(args.value, args.specimen, args.group, args.last_runs, args.param_set):
+                writer.write(list(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
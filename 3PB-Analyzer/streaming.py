@@ -0,0 +1,330 @@
+"""
+Streaming module, used to analyze a curve while the test is running, e.g. by following the CSV file that the
+testing machine is writing.
+
+A `StreamingAnalyzer` receives the samples in chunks and keeps running state: the maximum force, the preload and
+peak bookkeeping of `trim_curve`, prefix sums from which the R² of every window ending at a new sample is derived,
+and the work integrated so far. Each new sample costs O(window sizes) work, so stiffness and maximum force can be
+displayed live.
+
+Once the force has reached `STREAM_MIN_PEAK_FORCE`, stopped decreasing after the peak and then stayed below
+`STREAM_FRACTURE_DROP` of the maximum for `STREAM_FRACTURE_SAMPLES` consecutive samples, the specimen is considered
+fractured, and the final result is computed once with the same stages as `analyse_data`, so it is identical to
+analyzing the finished file (as long as the force does not exceed the peak again). A single noisy sample below the
+drop, early on the ramp, is not enough.
+
+Usage:
+    python -m streaming <folder>/<name>/<name>Data.csv --follow
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+
+import numpy as np
+
+from analysis import analyse_curve, find_yield_point, fit_line, r2_from_sums
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_WINDOW_ENGINE,
+                    STREAM_FRACTURE_DROP, STREAM_MIN_PEAK_FORCE, STREAM_FRACTURE_SAMPLES, STREAM_POLL_INTERVAL)
+
+
+class StreamingAnalyzer:
+    """
+    Analyzes a force-displacement curve sample by sample.
+
+    Call `add` with each new chunk of samples; it returns the final result (as returned by `analyse_data`) once the
+    fracture is detected, and None before. `snapshot` gives the live values at any time.
+    """
+
+    def __init__(self, min_window_size=DEFAULT_MIN_WINDOW_SIZE, max_window_size=DEFAULT_MAX_WINDOW_SIZE, preload=DEFAULT_PRELOAD,
+                 YFC=DEFAULT_Yield_Force_Constant, dispc=DEFAULT_Displacement_Constant, engine=DEFAULT_WINDOW_ENGINE,
+                 drop_ratio=STREAM_FRACTURE_DROP, min_peak_force=STREAM_MIN_PEAK_FORCE, drop_samples=STREAM_FRACTURE_SAMPLES):
+        """
+        Args:
+            min_window_size (int, optional): The minimum size of the linear regression window. Defaults to `DEFAULT_MIN_WINDOW_SIZE`.
+            max_window_size (int, optional): The maximum size of the linear regression window. Defaults to `DEFAULT_MAX_WINDOW_SIZE`.
+            preload (float, optional): The preload value. Defaults to `DEFAULT_PRELOAD`.
+            engine (str, optional): The window search engine of the final result. Defaults to `DEFAULT_WINDOW_ENGINE`.
+            drop_ratio (float, optional): The fraction of the maximum force below which the specimen is considered
+                fractured. Defaults to `STREAM_FRACTURE_DROP`.
+            min_peak_force (float, optional): The maximum force below which no drop counts as a fracture.
+                Defaults to `STREAM_MIN_PEAK_FORCE`.
+            drop_samples (int, optional): The number of consecutive samples the force must stay below the drop.
+                Defaults to `STREAM_FRACTURE_SAMPLES`.
+        """
+        self.min_window_size = min_window_size
+        self.max_window_size = max_window_size
+        self.preload = preload
+        self.YFC = YFC
+        self.dispc = dispc
+        self.engine = engine
+        self.drop_ratio = drop_ratio
+        self.min_peak_force = min_peak_force
+        self.drop_samples = drop_samples
+        self._sizes = np.arange(min_window_size, max_window_size + 1)
+
+        self.samples = 0
+        self._x = np.empty(1024)
+        self._y = np.empty(1024)
+        # Running sums of x, y, x², y² and xy relative to the first sample, with a leading zero row.
+        self._prefix = np.zeros((1025, 5))
+        self._origin = None
+
+        self.max_force = -np.inf
+        self.max_index = None
+        self._nonpositive = None
+        self._pre_index = 0
+        self.first_index = None
+        self.rise_index = None
+
+        self.work = 0.0
+        self._best = None
+        self.stiffness = None
+        self.intercept = None
+
+        self._dropped = 0  # The number of consecutive samples below the drop, after the rise
+        self.fractured = False
+        self.result = None
+
+    def _reserve(self, count):
+        """Grows the buffers, doubling their capacity, so they can hold `count` more samples."""
+        needed = self.samples + count
+        if needed <= len(self._x):
+            return
+        capacity = max(needed, 2 * len(self._x))
+        for name in ("_x", "_y"):
+            grown = np.empty(capacity)
+            grown[:self.samples] = getattr(self, name)[:self.samples]
+            setattr(self, name, grown)
+        prefix = np.zeros((capacity + 1, 5))
+        prefix[:self.samples + 1] = self._prefix[:self.samples + 1]
+        self._prefix = prefix
+
+    def add(self, x, y):
+        """
+        Adds a chunk of samples.
+
+        Args:
+            x (array-like): The new X-axis samples.
+            y (array-like): The new Y-axis samples.
+
+        Returns:
+            dict or None: The final result once the fracture has been detected, None before.
+        """
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        if len(x) != len(y):
+            raise ValueError(f"The chunks have different lengths: {len(x)} and {len(y)}.")
+        self._reserve(len(x))
+        for xi, yi in zip(x.tolist(), y.tolist()):
+            self._add_sample(xi, yi)
+        return self.result
+
+    def _add_sample(self, xi, yi):
+        """Updates the running state with a single sample."""
+        i = self.samples
+        self._x[i] = xi
+        self._y[i] = yi
+        if self._origin is None:
+            self._origin = (xi, yi)
+        dx = xi - self._origin[0]
+        dy = yi - self._origin[1]
+        self._prefix[i + 1] = self._prefix[i] + (dx, dy, dx * dx, dy * dy, dx * dy)
+        self.samples = i + 1
+
+        region_changed = False
+        if yi > self.max_force:
+            self.max_force = yi
+            self.max_index = i
+            self.rise_index = None
+            # As in trim_curve, the region starts after the highest non-positive force before the peak.
+            pre_index = self._nonpositive[1] if self._nonpositive else 0
+            if pre_index != self._pre_index:
+                self._pre_index = pre_index
+                reached = np.flatnonzero(self._y[pre_index:i + 1] >= self.preload)
+                first_index = pre_index + int(reached[0]) if len(reached) else None
+                if first_index != self.first_index:
+                    self._restart_region(first_index)
+                    region_changed = True
+        elif self.max_index is not None and self.rise_index is None and yi >= self._y[i - 1]:
+            self.rise_index = i
+
+        if yi <= 0 and (self._nonpositive is None or yi > self._nonpositive[0]):
+            self._nonpositive = (yi, i)
+
+        if not region_changed:
+            if self.first_index is None:
+                if yi >= self.preload:
+                    self._restart_region(i)
+            else:
+                self._extend_region(i)
+
+        # trim_curve ignores a rise at the very last sample, so the drop must come after the rise.
+        if (self.rise_index is not None and self.rise_index < i and self.max_force >= self.min_peak_force
+                and yi < self.drop_ratio * self.max_force):
+            self._dropped += 1
+        else:
+            self._dropped = 0
+        if not self.fractured and self._dropped >= self.drop_samples:
+            self.fractured = True
+            self.result = self._final_result()
+
+    def _restart_region(self, first_index):
+        """Moves the start of the loading region, and replays the live statistics from there."""
+        self.first_index = first_index
+        self.work = 0.0
+        self._best = None
+        self.stiffness = None
+        self.intercept = None
+        if first_index is not None:
+            for j in range(first_index, self.samples):
+                self._extend_region(j)
+
+    def _extend_region(self, j):
+        """Adds sample `j` to the live work integral and scores the windows ending at it."""
+        if j > self.first_index:
+            self.work += 0.5 * (self._y[j] + self._y[j - 1]) * (self._x[j] - self._x[j - 1])
+
+        sizes = self._sizes[self._sizes <= j + 1 - self.first_index]
+        if not len(sizes):
+            return
+        starts = j + 1 - sizes
+        sums = self._prefix[j + 1] - self._prefix[starts]
+        r2 = r2_from_sums(*sums.T, sizes)
+        k = int(np.argmax(r2))
+        if self._best is None or r2[k] > self._best[0]:
+            start = int(starts[k])
+            self._best = (r2[k], start, j + 1)
+            self.stiffness, self.intercept, _ = fit_line(self._x[start:j + 1], self._y[start:j + 1])
+
+    def _final_result(self):
+        """Analyzes the samples received so far with the batch stages, or returns None on error."""
+        try:
+            return analyse_curve(self._x[:self.samples].copy(), self._y[:self.samples].copy(), self.min_window_size,
+                                 self.max_window_size, self.preload, self.YFC, self.dispc, self.engine)
+        except Exception as e:
+            logging.error(f"Error in streaming analysis: {e}")
+            return None
+
+    def finish(self):
+        """
+        Ends the stream.
+
+        Returns:
+            dict or None: The result at the detected fracture or, if none was detected, the result of all the
+            samples; None on error.
+        """
+        if not self.fractured:
+            self.fractured = True
+            self.result = self._final_result()
+        return self.result
+
+    def snapshot(self):
+        """
+        Returns the live values.
+
+        The stiffness is that of the best window so far, and the yield force is searched after it with the current
+        maximum displacement, so both can still change until the fracture.
+
+        Returns:
+            dict: The number of samples, the maximum force, the stiffness, the fit window, the provisional yield force,
+            the work integrated so far and whether the fracture has been detected.
+        """
+        yield_force = None
+        if self._best is not None:
+            first = self.first_index
+            x_region = self._x[first:self.samples]
+            y_region = self._y[first:self.samples]
+            _, yield_force = find_yield_point(x_region, y_region, self.stiffness, self.intercept, self._best[2] - first,
+                                              y_region.max(), x_region.max(), self.YFC, self.dispc)
+        return {"samples": self.samples, "max_force": self.max_force if self.max_index is not None else None,
+                "stiffness": self.stiffness, "window": self._best[1:] if self._best else None, "yield_force": yield_force,
+                "work": self.work, "fractured": self.fractured}
+
+
+def follow_csv(csv_file, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, poll_interval=STREAM_POLL_INTERVAL,
+               idle_timeout=None, stop_event=None):
+    """
+    Reads the new rows of a CSV file as it is being written.
+
+    Only complete lines are read; a partly written last line is kept until its end arrives.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        poll_interval (float, optional): The number of seconds between two reads. Defaults to `STREAM_POLL_INTERVAL`.
+        idle_timeout (float, optional): Stops after this many seconds without new rows. Defaults to never.
+        stop_event (threading.Event, optional): Stops when set.
+
+    Yields:
+        tuple: The X and Y values of the new rows, as lists of floats.
+    """
+    stop_event = stop_event or threading.Event()
+    columns = None
+    pending = ""
+    last_data = time.monotonic()
+    with open(csv_file, "r", newline="", encoding="utf-8") as f:
+        while not stop_event.is_set():
+            pending += f.read()
+            lines = pending.split("\n")
+            pending = lines.pop()
+            x, y = [], []
+            for line in lines:
+                fields = line.rstrip("\r").split(",")
+                if columns is None:
+                    if x_column not in fields or y_column not in fields:
+                        raise ValueError(f"Column '{x_column}' or '{y_column}' not found in the CSV file.")
+                    columns = (fields.index(x_column), fields.index(y_column))
+                elif len(fields) > max(columns):
+                    x.append(float(fields[columns[0]]))
+                    y.append(float(fields[columns[1]]))
+            if x:
+                last_data = time.monotonic()
+                yield x, y
+            elif idle_timeout is not None and time.monotonic() - last_data >= idle_timeout:
+                return
+            else:
+                stop_event.wait(poll_interval)
+
+
+def main(argv=None):
+    """Analyzes a CSV file while it is being written, printing the live values."""
+    parser = argparse.ArgumentParser(description="Analyzes a data file while the test is running.")
+    parser.add_argument("csv_file", help="The CSV file written by the testing machine.")
+    parser.add_argument("--min-window", type=int, default=DEFAULT_MIN_WINDOW_SIZE, help="The minimum linear regression window size.")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW_SIZE, help="The maximum linear regression window size.")
+    parser.add_argument("--preload", type=float, default=DEFAULT_PRELOAD, help="The preload force used to trim the data.")
+    parser.add_argument("--yfc", type=float, default=DEFAULT_Yield_Force_Constant, help="The Yield Force Constant (YFC).")
+    parser.add_argument("--dispc", type=float, default=DEFAULT_Displacement_Constant, help="The Displacement Constant (dispc).")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--follow", action="store_true", help="Keep reading the file as it grows, until the fracture.")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="With --follow, stop after this many seconds without new rows.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level="WARNING", format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not os.path.isfile(args.csv_file):
+        parser.error(f"file not found: {args.csv_file}")
+
+    analyzer = StreamingAnalyzer(args.min_window, args.max_window, args.preload, args.yfc, args.dispc)
+    idle_timeout = args.idle_timeout if args.follow else 0
+    for x, y in follow_csv(args.csv_file, args.x_column, args.y_column, idle_timeout=idle_timeout):
+        analyzer.add(x, y)
+        live = analyzer.snapshot()
+        print(f"{live['samples']} samples: max force {live['max_force']}, stiffness {live['stiffness']}, "
+              f"yield force {live['yield_force']}, work {live['work']:.4f}", file=sys.stderr)
+        if analyzer.fractured:
+            break
+
+    result = analyzer.finish()
+    if result is None:
+        return 1
+    print(",".join(str(v) for v in result["results"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Sweep module, used to analyze a folder with every combination of a grid of parameter values.
+
+Each file is parsed once, and the stages of `analyse_data` are memoized per file: the trimmed curve (with its
+maximum force, fracture point and work to fracture) per preload, and the best stiffness window per preload and
+window range. Only the yield point search is repeated for each combination of YFC and dispc.
+
+The results form a long table with one row per file and parameter combination.
+
+Usage:
+    python -m sweep <folder> --preload 0 1 2 --yfc 0.9 1.0 --dispc 0.002 0.005 -o sweep.csv
+"""
+
+import os
+import sys
+import logging
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from ingest import read_xy
+from analysis import (HEADERS, find_data_files, trim_curve, find_best_window, find_yield_point, find_fracture_index,
+                      work_to_fracture)
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_WINDOW_ENGINE, DEFAULT_WORKERS,
+                    DEFAULT_USE_SIDECAR, WINDOW_ENGINES)
+
+SWEEP_PARAMETERS = ("preload", "min_window_size", "max_window_size", "YFC", "dispc")
+"""The parameters of a sweep grid, named as in `analyse_data`, from the most to the least expensive to change."""
+SWEEP_HEADERS = [HEADERS[0], *SWEEP_PARAMETERS, *HEADERS[1:], "Error"]
+"""The column headers of the sweep rows."""
+
+
+def parameter_grid(preload=(DEFAULT_PRELOAD,), min_window_size=(DEFAULT_MIN_WINDOW_SIZE,), max_window_size=(DEFAULT_MAX_WINDOW_SIZE,),
+                   YFC=(DEFAULT_Yield_Force_Constant,), dispc=(DEFAULT_Displacement_Constant,)):
+    """
+    Lists every combination of the given parameter values.
+
+    Returns:
+        list: One dict per combination, keyed by `SWEEP_PARAMETERS`, with the last parameters changing fastest.
+    """
+    values = (preload, min_window_size, max_window_size, YFC, dispc)
+    return [dict(zip(SWEEP_PARAMETERS, combo)) for combo in itertools.product(*values)]
+
+
+def _memoized(memo, key, func, *args):
+    """Returns `func(*args)` from `memo`, computing it once per key. Errors are memoized and raised again."""
+    if key not in memo:
+        try:
+            memo[key] = (True, func(*args))
+        except Exception as e:
+            memo[key] = (False, e)
+    ok, value = memo[key]
+    if not ok:
+        raise value
+    return value
+
+
+def _trimmed_stages(x_raw, y_raw, preload):
+    """Runs the stages that only depend on the preload: trimming, maximum force, fracture point and work to fracture."""
+    x_data, y_data = trim_curve(x_raw, y_raw, preload)
+    fracture_index = find_fracture_index(y_data)
+    return x_data, y_data, x_data.max(), y_data.max(), fracture_index, work_to_fracture(x_data, y_data, fracture_index)
+
+
+def sweep_file(csv_file, grid, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, engine=DEFAULT_WINDOW_ENGINE,
+               sidecar=DEFAULT_USE_SIDECAR):
+    """
+    Analyzes a single CSV file with every combination of a parameter grid.
+
+    The results of each combination are the same as those of `analyse_data` with the same parameters.
+
+    Args:
+        csv_file (str): The path to the CSV file.
+        grid (list): The parameter combinations, as returned by `parameter_grid`.
+        x_column (str, optional): The column name for the X-axis data. Defaults to `DEFAULT_X_COLUMN`.
+        y_column (str, optional): The column name for the Y-axis data. Defaults to `DEFAULT_Y_COLUMN`.
+        engine (str, optional): The stiffness window search engine. Defaults to `DEFAULT_WINDOW_ENGINE`.
+        sidecar (bool, optional): Whether to read the data through a binary sidecar file. Defaults to `DEFAULT_USE_SIDECAR`.
+
+    Returns:
+        list: One row per combination, with the `SWEEP_HEADERS` columns. Failed combinations have empty results
+        and an error message.
+    """
+    file_name = os.path.basename(os.path.dirname(csv_file))
+    try:
+        x_raw, y_raw = read_xy(csv_file, x_column, y_column, sidecar=sidecar)
+    except Exception as e:
+        logging.error(f"Error reading file {csv_file}: {e}")
+        return [[file_name, *(params[p] for p in SWEEP_PARAMETERS), None, None, None, None, None, str(e)] for params in grid]
+
+    trimmed = {}
+    windows = {}
+    rows = []
+    for params in grid:
+        preload = params["preload"]
+        min_window_size = params["min_window_size"]
+        max_window_size = params["max_window_size"]
+        row = [file_name, *(params[p] for p in SWEEP_PARAMETERS)]
+        try:
+            x_data, y_data, max_disp, max_value, fracture_index, auc = _memoized(trimmed, preload, _trimmed_stages, x_raw, y_raw, preload)
+            a, b, best_start, best_end = _memoized(windows, (preload, min_window_size, max_window_size), find_best_window,
+                                                   x_data, y_data, min_window_size, max_window_size, engine)
+            next_x, next_y = find_yield_point(x_data, y_data, a, b, best_end, max_value, max_disp, params["YFC"], params["dispc"])
+            postyield_displacement = x_data[fracture_index] - next_x
+            rows.append(row + [max_value, a, next_y, postyield_displacement, auc, None])
+        except Exception as e:
+            rows.append(row + [None, None, None, None, None, str(e)])
+    return rows
+
+
+def run_sweep(files, grid, x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, engine=DEFAULT_WINDOW_ENGINE,
+              sidecar=DEFAULT_USE_SIDECAR, workers=DEFAULT_WORKERS, progress_callback=None):
+    """
+    Sweeps a list of CSV files, serially or in a pool of worker processes.
+
+    Args:
+        files (list): The paths of the CSV files.
+        grid (list): The parameter combinations, as returned by `parameter_grid`.
+        workers (int, optional): The number of worker processes. Defaults to `DEFAULT_WORKERS`.
+        progress_callback (function, optional): Called with (completed files, total files).
+
+    Yields:
+        list: The rows of each file, in the order of `files`, as soon as they are available.
+    """
+    kwargs = dict(x_column=x_column, y_column=y_column, engine=engine, sidecar=sidecar)
+    total_files = len(files)
+
+    if workers is None or workers <= 1 or total_files <= 1:
+        for index, f in enumerate(files):
+            yield sweep_file(f, grid, **kwargs)
+            if progress_callback:
+                progress_callback(index + 1, total_files)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, total_files), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(sweep_file, f, grid, **kwargs) for f in files]
+        for index, future in enumerate(futures):
+            yield future.result()
+            if progress_callback:
+                progress_callback(index + 1, total_files)
+
+
+def main(argv=None):
+    """Runs a parameter sweep from the command line."""
+    parser = argparse.ArgumentParser(description="Analyzes all the *Data.csv files of a folder with every combination of parameters.")
+    parser.add_argument("folder", help="The root folder containing one subfolder per sample.")
+    parser.add_argument("--preload", type=float, nargs="+", default=[DEFAULT_PRELOAD], help="The preload values.")
+    parser.add_argument("--min-window", type=int, nargs="+", default=[DEFAULT_MIN_WINDOW_SIZE], help="The minimum window sizes.")
+    parser.add_argument("--max-window", type=int, nargs="+", default=[DEFAULT_MAX_WINDOW_SIZE], help="The maximum window sizes.")
+    parser.add_argument("--yfc", type=float, nargs="+", default=[DEFAULT_Yield_Force_Constant], help="The Yield Force Constant values.")
+    parser.add_argument("--dispc", type=float, nargs="+", default=[DEFAULT_Displacement_Constant], help="The Displacement Constant values.")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--engine", choices=WINDOW_ENGINES, default=DEFAULT_WINDOW_ENGINE, help="The stiffness window search engine.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="The number of worker processes.")
+    parser.add_argument("--sidecar", action=argparse.BooleanOptionalAction, default=DEFAULT_USE_SIDECAR,
+                        help="Read the data through binary .npy sidecar files.")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="The format of the result rows.")
+    parser.add_argument("-o", "--output", default="-", help="The file the result rows are written to (default: stdout).")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not report progress on stderr.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level="WARNING", format='%(asctime)s - %(levelname)s - %(message)s')
+
+    folder = os.path.normpath(args.folder)
+    if not os.path.isdir(folder):
+        parser.error(f"folder not found: {args.folder}")
+
+    from cli import RowWriter
+
+    grid = parameter_grid(args.preload, args.min_window, args.max_window, args.yfc, args.dispc)
+    files = find_data_files(folder)
+
+    def on_progress(current_step, max_steps):
+        if not args.quiet:
+            print(f"Swept {current_step}/{max_steps} files ({len(grid)} combinations each)", file=sys.stderr)
+
+    stream = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    failed = 0
+    try:
+        writer = RowWriter(stream, args.format, SWEEP_HEADERS)
+        for rows in run_sweep(files, grid, args.x_column, args.y_column, args.engine, args.sidecar, args.workers, on_progress):
+            for row in rows:
+                writer.write(row)
+                failed += row[-1] is not None
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+
+    if failed:
+        print(f"{failed} of {len(files) * len(grid)} analyses failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Synthetic data module, used to generate realistic three-point bending curves for benchmarks.
+
+Each curve has a preload region, a linear elastic ramp, a yield region curving to the peak force, a post-peak
+drop and a final fracture, with measurement noise. The files are written in the layout expected by the
+application: `<root>/<name>/<name>Data.csv`, with the same columns as the instrument files.
+
+Usage:
+    python -m synthetic <root> --specimens 100 --samples 5000
+"""
+
+import os
+import sys
+import argparse
+import numpy as np
+
+CSV_HEADER = "SetName,Cycle,Time_S,Size_mm,Displacement_mm,Force_N"
+"""The header of the instrument CSV files."""
+GROUPS = "ABCD"
+"""The group prefixes of the generated specimen names."""
+
+
+def generate_curve(samples=500, rng=None, stiffness=None, max_force=None, noise=0.05):
+    """
+    Generates a single force-displacement curve.
+
+    Args:
+        samples (int, optional): The number of samples. Defaults to 500.
+        rng (numpy.random.Generator, optional): The random generator. Defaults to a new unseeded generator.
+        stiffness (float, optional): The elastic stiffness in N/mm. Defaults to a random value between 40 and 80.
+        max_force (float, optional): The peak force in N. Defaults to a random value between 12 and 20.
+        noise (float, optional): The standard deviation of the force noise in N. Defaults to 0.05.
+
+    Returns:
+        tuple: The displacement and force arrays, and the index of the first sample after the preload region.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    stiffness = stiffness if stiffness is not None else rng.uniform(40, 80)
+    max_force = max_force if max_force is not None else rng.uniform(12, 20)
+
+    yield_force = 0.75 * max_force
+    yield_disp = yield_force / stiffness
+    # The force keeps rising with a decreasing slope after yield, and peaks when the slope reaches zero.
+    peak_disp = yield_disp + 2 * (max_force - yield_force) / stiffness
+    drop_disp = peak_disp + rng.uniform(0.05, 0.2)
+    end_disp = drop_disp * 1.08
+
+    preload_samples = max(3, samples // 20)
+    loading = np.linspace(0, end_disp, samples - preload_samples)
+    force = np.empty_like(loading)
+
+    elastic = loading <= yield_disp
+    force[elastic] = stiffness * loading[elastic]
+    hardening = (loading > yield_disp) & (loading <= peak_disp)
+    t = (loading[hardening] - yield_disp) / (peak_disp - yield_disp)
+    force[hardening] = yield_force + (max_force - yield_force) * (2 * t - t * t)
+    post_peak = (loading > peak_disp) & (loading <= drop_disp)
+    t = (loading[post_peak] - peak_disp) / (drop_disp - peak_disp)
+    force[post_peak] = max_force * (1 - 0.35 * t * t)
+    fractured = loading > drop_disp
+    force[fractured] = 0.3 * rng.uniform(0.5, 1.5)
+
+    force = force + rng.normal(0, noise, len(force))
+    preload = rng.normal(0, noise, preload_samples)
+
+    displacement = np.concatenate([np.zeros(preload_samples), loading])
+    return displacement, np.concatenate([preload, force]), preload_samples
+
+
+def write_curve(path, displacement, force, preload_samples, size=29.0, sample_period=0.2):
+    """
+    Writes a curve to a CSV file in the instrument format.
+
+    Args:
+        path (str): The path to the CSV file.
+        displacement (numpy.ndarray): The displacement data in mm.
+        force (numpy.ndarray): The force data in N.
+        preload_samples (int): The number of samples of the "1-Preload" cycle.
+        size (float, optional): The initial specimen size in mm. Defaults to 29.0.
+        sample_period (float, optional): The time between two samples in seconds. Defaults to 0.2.
+    """
+    n = len(displacement)
+    cycle = np.where(np.arange(n) < preload_samples, "1-Preload", "1-Compress")
+    time_s = np.char.mod("%.3f", np.arange(n) * sample_period)
+    size_mm = np.char.mod("%.3f", size - displacement)
+    disp = np.char.mod("%.3f", displacement)
+    forces = np.char.mod("%.3f", force)
+    lines = ["3-Point1," + ",".join(fields) for fields in zip(cycle, time_s, size_mm, disp, forces)]
+    with open(path, "w", newline="") as f:
+        f.write(CSV_HEADER + "\n")
+        f.write("\n".join(lines))
+        f.write("\n")
+
+
+def specimen_name(index):
+    """Returns the name of the n-th specimen, e.g. "A001", "B002", ..."""
+    return f"{GROUPS[index % len(GROUPS)]}{index + 1:03d}"
+
+
+def generate_dataset(root, specimens=10, samples=500, seed=0, noise=0.05):
+    """
+    Generates a folder of synthetic specimens.
+
+    Args:
+        root (str): The root folder, created if needed.
+        specimens (int, optional): The number of specimens. Defaults to 10.
+        samples (int, optional): The number of samples per curve. Defaults to 500.
+        seed (int, optional): The random seed, the same seed always gives the same files. Defaults to 0.
+        noise (float, optional): The standard deviation of the force noise in N. Defaults to 0.05.
+
+    Returns:
+        list: The paths of the generated CSV files.
+    """
+    rng = np.random.default_rng(seed)
+    paths = []
+    for index in range(specimens):
+        name = specimen_name(index)
+        folder = os.path.join(root, name)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, name + "Data.csv")
+        displacement, force, preload_samples = generate_curve(samples, rng, noise=noise)
+        write_curve(path, displacement, force, preload_samples)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    """Generates a synthetic dataset from the command line."""
+    parser = argparse.ArgumentParser(description="Generates synthetic three-point bending data files.")
+    parser.add_argument("root", help="The root folder of the generated specimens.")
+    parser.add_argument("--specimens", type=int, default=10, help="The number of specimens.")
+    parser.add_argument("--samples", type=int, default=500, help="The number of samples per curve.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed.")
+    parser.add_argument("--noise", type=float, default=0.05, help="The standard deviation of the force noise in N.")
+    args = parser.parse_args(argv)
+    paths = generate_dataset(args.root, args.specimens, args.samples, args.seed, args.noise)
+    print(f"Generated {len(paths)} files in {args.root}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
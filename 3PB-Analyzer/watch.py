@@ -0,0 +1,276 @@
+"""
+Watch module, used to analyze new data files as soon as the testing machine has finished writing them.
+
+The data folder is polled with `os.scandir` (a portable alternative to inotify, which is Linux-only): the root is
+listed at every scan, and a sample folder is only listed again when its modification time changes. A new
+`<name>/<name>Data.csv` file is analyzed once its size and modification time have not changed for
+`WATCH_SETTLE_SECONDS`.
+
+Files are analyzed by `process_file` in worker processes, so a burst of new files never blocks the scans. Each
+result row is appended to `<folder>.csv` as soon as it is available, the plots are rendered into the usual PNG
+folder, and the other result files (the Excel file by default) are rewritten after each scan that produced new
+rows. The rows already in `<folder>.csv` are loaded at startup, so a restarted watcher never analyzes those
+specimens again.
+
+Usage:
+    python -m watch <folder> [options]
+"""
+
+import os
+import sys
+import csv
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from utils import get_resource_path
+from analysis import HEADERS, process_file, plot_outcome, warm_up
+from output import write_results
+from config import (DEFAULT_MIN_WINDOW_SIZE, DEFAULT_MAX_WINDOW_SIZE, DEFAULT_PRELOAD, DEFAULT_Yield_Force_Constant,
+                    DEFAULT_Displacement_Constant, DEFAULT_X_COLUMN, DEFAULT_Y_COLUMN, DEFAULT_WINDOW_ENGINE, DEFAULT_WORKERS,
+                    DEFAULT_PLOT_WORKERS, DEFAULT_OUTPUT_FORMATS, OUTPUT_FORMATS, OUTPUT_IMAGE_DIR, WINDOW_ENGINES,
+                    WATCH_INTERVAL, WATCH_SETTLE_SECONDS, LOG_LEVEL)
+
+
+def _journal_value(value):
+    """Converts a value read back from the results CSV file to the type of a result row."""
+    if value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class FolderWatcher:
+    """
+    Watches a data folder and analyzes each new data file once.
+
+    Call `poll` periodically (or `run` to loop until stopped), then `close`.
+    """
+
+    def __init__(self, root, min_window_size=DEFAULT_MIN_WINDOW_SIZE, max_window_size=DEFAULT_MAX_WINDOW_SIZE, preload=DEFAULT_PRELOAD,
+                 YFC=DEFAULT_Yield_Force_Constant, disp_c=DEFAULT_Displacement_Constant, engine=DEFAULT_WINDOW_ENGINE,
+                 x_column=DEFAULT_X_COLUMN, y_column=DEFAULT_Y_COLUMN, workers=DEFAULT_WORKERS, plots=True,
+                 plot_workers=DEFAULT_PLOT_WORKERS, output_formats=DEFAULT_OUTPUT_FORMATS, settle_seconds=WATCH_SETTLE_SECONDS,
+                 result_callback=None):
+        """
+        Loads the rows already in the results CSV file and starts the worker processes.
+
+        Args:
+            root (str): The root folder containing one subfolder per sample.
+            workers (int, optional): The number of worker processes. Defaults to `DEFAULT_WORKERS`.
+            plots (bool, optional): Whether to render the plot of each analyzed file. Defaults to True.
+            plot_workers (int, optional): The number of plot rendering threads. Defaults to `DEFAULT_PLOT_WORKERS`.
+            output_formats (tuple, optional): The result files rewritten after new rows, besides the results CSV file.
+                Defaults to `DEFAULT_OUTPUT_FORMATS`.
+            settle_seconds (float, optional): How long a file must stay unchanged before it is analyzed.
+                Defaults to `WATCH_SETTLE_SECONDS`.
+            result_callback (function, optional): Called with the outcome of each analyzed file.
+        """
+        self.root = os.path.normpath(root)
+        self.settle_seconds = settle_seconds
+        self.result_callback = result_callback
+        self.output_formats = tuple(f for f in output_formats if f != "csv")
+        self.base_path = get_resource_path(self.root)
+        self.journal_path = self.base_path + ".csv"
+        self.png_dir = get_resource_path(self.root + OUTPUT_IMAGE_DIR)
+        self.analysis_kwargs = dict(x_column=x_column, y_column=y_column, min_window_size=min_window_size,
+                                    max_window_size=max_window_size, preload=preload, YFC=YFC, dispc=disp_c, engine=engine)
+        self._process_kwargs = dict(min_window_size=min_window_size, max_window_size=max_window_size, preload=preload, YFC=YFC,
+                                    disp_c=disp_c, engine=engine, x_column=x_column, y_column=y_column)
+
+        self.rows = []
+        self.processed = set()
+        self.failed = {}
+        self._folders = {}
+        self._candidates = {}
+        self._running = {}
+        self._load_journal()
+
+        if plots:
+            from plotting import PlotPipeline
+            os.makedirs(self.png_dir, exist_ok=True)
+            self._pipeline = PlotPipeline(plot_workers)
+        else:
+            self._pipeline = None
+        self._executor = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=warm_up, initargs=("none",))
+
+    def _load_journal(self):
+        """Loads the rows of a previous run from the results CSV file, or creates it with its header."""
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", newline="", encoding="utf-8") as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if row:
+                        self.rows.append([row[0]] + [_journal_value(v) for v in row[1:]])
+                        self.processed.add(row[0])
+            logging.info(f"Loaded {len(self.rows)} results from {self.journal_path}")
+        else:
+            with open(self.journal_path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(HEADERS)
+
+    def _scan(self):
+        """
+        Lists the data files of the root folder.
+
+        Returns:
+            dict: The (size, modification time) of each data file, keyed by sample name.
+        """
+        found = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name in self.processed or entry.name in self._running:
+                    continue
+                mtime = entry.stat().st_mtime_ns
+                cached = self._folders.get(entry.name)
+                if cached is None or cached[0] != mtime:
+                    with os.scandir(entry.path) as files:
+                        data_files = [f.path for f in files if f.is_file() and f.name.endswith("Data.csv")]
+                    cached = self._folders[entry.name] = (mtime, data_files)
+                for path in cached[1]:
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    found[entry.name] = (path, (stat.st_size, stat.st_mtime_ns))
+        return found
+
+    def poll(self):
+        """
+        Collects the finished analyses, then scans the folder and submits the files that are fully written.
+
+        Returns:
+            int: The number of new result rows.
+        """
+        new_rows = self._collect()
+
+        now = time.monotonic()
+        found = self._scan()
+        for name, (path, signature) in found.items():
+            if self.failed.get(name) == signature:
+                continue
+            previous = self._candidates.get(name)
+            if previous is None or previous[1] != signature:
+                self._candidates[name] = (path, signature, now)
+            elif signature[0] > 0 and now - previous[2] >= self.settle_seconds:
+                del self._candidates[name]
+                self._running[name] = (self._executor.submit(process_file, path, **self._process_kwargs), signature)
+                logging.info(f"Analyzing new file {path}")
+        for name in set(self._candidates) - set(found):
+            del self._candidates[name]
+        return new_rows
+
+    def _collect(self):
+        """Handles the finished analyses: appends their rows to the results files and queues their plots."""
+        done = [name for name, (future, _) in self._running.items() if future.done()]
+        if not done:
+            return 0
+        new_rows = []
+        for name in done:
+            future, signature = self._running.pop(name)
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = {"file": self._folders[name][1][0], "name": name, "row": None, "results_plot": None, "error": str(e)}
+            if outcome["row"]:
+                self.processed.add(name)
+                self.failed.pop(name, None)
+                new_rows.append(outcome["row"])
+            else:
+                # A failed file is only analyzed again if it changes.
+                self.failed[name] = signature
+                logging.error(f"Error analyzing {outcome['file']}: {outcome['error']}")
+            if self._pipeline:
+                self._pipeline.submit(plot_outcome, outcome, self.png_dir, self.analysis_kwargs)
+            if self.result_callback:
+                self.result_callback(outcome)
+
+        if new_rows:
+            with open(self.journal_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                for row in new_rows:
+                    writer.writerow(["" if v is None else v for v in row])
+            self.rows.extend(new_rows)
+            if self.output_formats:
+                write_results(sorted(self.rows, key=lambda row: row[0]), self.base_path, HEADERS, formats=self.output_formats)
+        return len(new_rows)
+
+    def run(self, interval=WATCH_INTERVAL, stop_event=None):
+        """
+        Polls the folder every `interval` seconds until `stop_event` is set (or forever).
+
+        Args:
+            interval (float, optional): The number of seconds between two scans. Defaults to `WATCH_INTERVAL`.
+            stop_event (threading.Event, optional): Stops the loop when set.
+        """
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"Error watching {self.root}: {e}")
+            stop_event.wait(interval)
+
+    def close(self):
+        """Waits for the running analyses and plots, and stops the worker processes."""
+        for future, _ in self._running.values():
+            future.exception()
+        self._collect()
+        self._executor.shutdown()
+        if self._pipeline:
+            self._pipeline.close()
+
+
+def main(argv=None):
+    """Watches a folder from the command line until interrupted."""
+    parser = argparse.ArgumentParser(description="Analyzes the new *Data.csv files of a folder as soon as they are written.")
+    parser.add_argument("folder", help="The root folder containing one subfolder per sample.")
+    parser.add_argument("--min-window", type=int, default=DEFAULT_MIN_WINDOW_SIZE, help="The minimum linear regression window size.")
+    parser.add_argument("--max-window", type=int, default=DEFAULT_MAX_WINDOW_SIZE, help="The maximum linear regression window size.")
+    parser.add_argument("--preload", type=float, default=DEFAULT_PRELOAD, help="The preload force used to trim the data.")
+    parser.add_argument("--yfc", type=float, default=DEFAULT_Yield_Force_Constant, help="The Yield Force Constant (YFC).")
+    parser.add_argument("--dispc", type=float, default=DEFAULT_Displacement_Constant, help="The Displacement Constant (dispc).")
+    parser.add_argument("--x-column", default=DEFAULT_X_COLUMN, help="The column name for the X-axis data.")
+    parser.add_argument("--y-column", default=DEFAULT_Y_COLUMN, help="The column name for the Y-axis data.")
+    parser.add_argument("--engine", choices=WINDOW_ENGINES, default=DEFAULT_WINDOW_ENGINE, help="The stiffness window search engine.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="The number of worker processes.")
+    parser.add_argument("--plots", action=argparse.BooleanOptionalAction, default=True, help="Render the plot of each new file.")
+    parser.add_argument("--plot-workers", type=int, default=DEFAULT_PLOT_WORKERS, help="The number of plot rendering threads.")
+    parser.add_argument("--result-files", nargs="*", choices=OUTPUT_FORMATS, default=list(DEFAULT_OUTPUT_FORMATS),
+                        help="The result files rewritten after new results, besides the results CSV file.")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="The number of seconds between two scans.")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                        help="The number of seconds a file must stay unchanged before it is analyzed.")
+    parser.add_argument("--log-level", default="INFO", help=f"The level of the log messages printed on stderr (the GUI uses {LOG_LEVEL}).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(stream=sys.stderr, level=args.log_level.upper(), format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if not os.path.isdir(args.folder):
+        parser.error(f"folder not found: {args.folder}")
+
+    def on_result(outcome):
+        if outcome["row"]:
+            print(",".join(str(v) for v in outcome["row"]), flush=True)
+
+    watcher = FolderWatcher(args.folder, args.min_window, args.max_window, args.preload, args.yfc, args.dispc, args.engine,
+                            args.x_column, args.y_column, args.workers, args.plots, args.plot_workers, tuple(args.result_files),
+                            args.settle, on_result)
+    logging.info(f"Watching {watcher.root}, results in {watcher.journal_path}")
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())